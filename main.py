@@ -9,13 +9,15 @@ from fastapi.responses import FileResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from source.config import LOG_LOCATION, STATIC_DIR
-from source.dependencies import get_current_active_user
+from source.dependencies import get_current_active_user, get_db_conn
 from source.note import note
 from source.point import point
 from source.summarize import summarize
 from source.symbol import symbol
 from source.users import users
-from source.util.util_base.db import create_db_pool, get_multi_data
+from source.util.util_base.db import create_db_pool, get_multi_data, get_statement_stats
+from source.util.util_cache.json_data_cache import json_data_cache
+from source.util.util_cache.response_cache import data_version, response_cache
 
 # log_filename = os.path.join(LOG_LOCATION, "future_picture.log")
 # logging.basicConfig(format="%(asctime)s %(levelname)s:%(message)s",
@@ -52,7 +54,20 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-app.mount("/front", StaticFiles(directory=STATIC_DIR), name="front")
+
+class RevalidateStaticFiles(StaticFiles):
+    """
+    StaticFiles 已为文件生成 ETag 及 Last-Modified, GET 请求的 If-None-Match 匹配时返回 304
+    加上 Cache-Control: no-cache, 浏览器每次使用前都带 If-None-Match 校验, 文件未变化时不重新下载
+    """
+
+    def file_response(self, *args, **kwargs):
+        response = super().file_response(*args, **kwargs)
+        response.headers.setdefault("Cache-Control", "no-cache")
+        return response
+
+
+app.mount("/front", RevalidateStaticFiles(directory=STATIC_DIR), name="front")
 
 app.include_router(users)
 # app.include_router(symbol, dependencies=[Depends(get_current_active_user)])
@@ -84,39 +99,45 @@ async def http_exception_handler(request, exc):
     return JSONResponse(str(exc), status_code=500)
 
 
-@app.middleware("http")
-async def db_session_middleware(request: Request, call_next):
-    async with db_pool.acquire() as db_conn:
-        # async with db_conn.cursor() as cursor:
-        request.state.db_conn = db_conn
-        response = await call_next(request)
-
-    return response
-
-
 @app.on_event("startup")
 async def startup():
     # TODO 没找到地方放 db_pool, 暂时使用 global
     global db_pool
     db_pool = await create_db_pool()
+    app.state.db_pool = db_pool
+    data_version.start(db_pool)
+    json_data_cache.start()
 
 
 # TODO 貌似 shutdown 这个 方法就没起作用, 暂时不知原因
 @app.on_event("shutdown")
 async def shutdown():
+    await json_data_cache.close()
+    await data_version.close()
     await db_pool.close()
     await db_pool.wait_closed()
 
 
 @app.get("/test")
-async def read_notes(request: Request):
-    db_conn = request.state.db_conn
+async def read_notes(request: Request, db_conn=Depends(get_db_conn)):
     r = await get_multi_data(db_conn, "SELECT * from s_info where ts_code in %s;", [["603559.SH", "000001.SZ"]])
 
     logger.info("sssssssssssss")
     return r
 
 
+@app.get("/statement_stats")
+async def statement_stats():
+    """命名语句在连接语句缓存中的命中及未命中次数, 累计耗时(秒), 未命中的耗时包含 prepare"""
+    return get_statement_stats()
+
+
+@app.get("/response_cache_stats")
+async def response_cache_stats():
+    """响应缓存的命中, 未命中, 淘汰, 失效次数及占用字节数"""
+    return response_cache.get_stats()
+
+
 @app.get("/")
 async def index():
     return FileResponse(os.path.join(STATIC_DIR, "index.html"))
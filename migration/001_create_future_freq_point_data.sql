@@ -0,0 +1,18 @@
+-- 预先聚合的周/月线数据, 由 /point/refresh_freq_point_data 在日线数据入库后增量刷新
+-- 表不存在或没有某个代码的数据时, 周/月线接口使用日线实时聚合
+create table if not exists future_freq_point_data (
+    ts_code varchar(32) not null,           -- 请求时使用的代码, 主力连续代码或合约代码
+    data_type varchar(8) not null,          -- main: 主力连续, ts: 合约
+    freq_code varchar(2) not null,          -- W, M
+    period_start_date date not null,
+    period_end_date date not null,
+    trade_date date not null,               -- 周期内最后一个交易日
+    mapping_ts_code varchar(32) not null,   -- 最后一个交易日对应的合约
+    open double precision,
+    high double precision,
+    low double precision,
+    close double precision,
+    vol double precision,
+    update_date timestamp,
+    primary key (ts_code, data_type, freq_code, period_end_date)
+);
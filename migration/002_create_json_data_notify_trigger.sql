@@ -0,0 +1,28 @@
+-- json_data 变化时通知 json_data_change, 进程内 json_data 缓存据此失效, 见 source/util/util_cache/json_data_cache.py
+create or replace function notify_json_data_change() returns trigger as $$
+begin
+    if tg_op <> 'INSERT' then
+        perform pg_notify('json_data_change', old.name);
+    end if;
+    if tg_op <> 'DELETE' then
+        perform pg_notify('json_data_change', new.name);
+    end if;
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists json_data_change on json_data;
+create trigger json_data_change after insert or update or delete on json_data
+for each row execute procedure notify_json_data_change();
+
+-- truncate 不触发行级触发器, 以空 payload 通知清空全部缓存
+create or replace function notify_json_data_truncate() returns trigger as $$
+begin
+    perform pg_notify('json_data_change', '');
+    return null;
+end;
+$$ language plpgsql;
+
+drop trigger if exists json_data_truncate on json_data;
+create trigger json_data_truncate after truncate on json_data
+for each statement execute procedure notify_json_data_truncate();
@@ -1,6 +1,8 @@
+import time
+from collections import OrderedDict
 from typing import Optional
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError
 from jose import jwt
@@ -10,6 +12,12 @@ from source.config import SECRET_KEY, ALGORITHM, USERS_DB
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
+# 已校验 token 的缓存数量上限及最长缓存时间(秒), 缓存时间不超过 token 的 exp
+TOKEN_CACHE_SIZE = 1024
+TOKEN_CACHE_TTL = 300
+# {token: (失效时间戳, user)}
+_token_cache = OrderedDict()
+
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -26,13 +34,49 @@ class UserInDB(User):
     hashed_password: str
 
 
+async def get_db_conn(request: Request):
+    """
+    只有需要访问数据库的路由才从连接池获取连接, 请求处理完成后归还
+    使用 gather_with_pool 或自行从连接池获取连接的路由不能使用此依赖, 否则占用一个连接的同时等待其他连接, 连接池耗尽时互相等待
+    """
+    async with request.app.state.db_pool.acquire() as db_conn:
+        yield db_conn
+
+
 def get_user(db, username: str):
     if username in db:
         user_dict = db[username]
         return UserInDB(**user_dict)
 
 
+def _get_cached_user(token):
+    cache_value = _token_cache.get(token)
+    if cache_value is None:
+        return None
+    expire_time, user = cache_value
+    if time.time() >= expire_time:
+        _token_cache.pop(token, None)
+        return None
+    _token_cache.move_to_end(token)
+    return user
+
+
+def _cache_user(token, user, exp):
+    expire_time = time.time() + TOKEN_CACHE_TTL
+    if exp is not None:
+        expire_time = min(expire_time, exp)
+    _token_cache[token] = (expire_time, user)
+    _token_cache.move_to_end(token)
+    while len(_token_cache) > TOKEN_CACHE_SIZE:
+        _token_cache.popitem(last=False)
+
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    """校验过的 token 在缓存有效期内直接返回用户, 不再重复校验签名"""
+    user = _get_cached_user(token)
+    if user is not None:
+        return user
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -49,6 +93,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     user = get_user(USERS_DB, username=token_data.username)
     if user is None:
         raise credentials_exception
+    _cache_user(token, user, payload.get("exp"))
     return user
 
 
@@ -1,12 +1,14 @@
 import datetime
 import os
-from typing import List, Dict
-import json
+from typing import Any, List, Dict
 
-from fastapi import APIRouter, Query, Request
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, Depends, Query, Request
+from pydantic import BaseModel, Field, ValidationError
 from source.config import NOTE_DIR
+from source.dependencies import get_db_conn
 from source.util.util_base.constant import FreqCode
+from source.util.util_cache.file_note_cache import file_note_cache
+from source.util.util_cache.json_data_cache import json_data_cache
 from source.util.util_data.note_data import NoteData
 
 note = APIRouter(prefix="/note", tags=["记录"])
@@ -21,11 +23,10 @@ class NoteWriteRequest(BaseModel):
 
 
 @note.post("/note_write", response_model=None)
-async def note_write(request: Request, request_params: NoteWriteRequest):
+async def note_write(request: Request, request_params: NoteWriteRequest, db_conn=Depends(get_db_conn)):
     """
     记录写入
     """
-    db_conn = request.state.db_conn
     # trade_date = convert_date_to_datetime(request_params.trade_date)
 
     await NoteData(db_conn).note_insert(request_params.main_ts_code, request_params.ts_code, request_params.freq_code, request_params.trade_date, request_params.note)
@@ -43,11 +44,10 @@ class BsNoteWriteRequest(BaseModel):
 
 
 @note.post("/bs_note_write", response_model=None)
-async def bs_note_write(request: Request, request_params: BsNoteWriteRequest):
+async def bs_note_write(request: Request, request_params: BsNoteWriteRequest, db_conn=Depends(get_db_conn)):
     """
     交易记录写入
     """
-    db_conn = request.state.db_conn
     # trade_date = convert_date_to_datetime(request_params.trade_date)
 
     await NoteData(db_conn).bs_note_insert(request_params.main_ts_code, request_params.ts_code, request_params.freq_code, request_params.trade_date, request_params.trade_type,
@@ -55,6 +55,51 @@ async def bs_note_write(request: Request, request_params: BsNoteWriteRequest):
                                            request_params.point, request_params.note)
 
 
+class BatchWriteResponse(BaseModel):
+    insert_number: int
+    error_list: List[Dict] = Field(..., example=[{"index": 0, "error": [{"type": "missing", "loc": ["point"], "msg": "Field required", "input": {}}]}])
+
+
+def _validate_batch_rows(row_list, model):
+    """逐行校验, 返回 (通过校验的行, [{"index": 行号, "error": 错误信息}, ...])"""
+    valid_row_list, error_list = [], []
+    for index, row in enumerate(row_list):
+        try:
+            valid_row_list.append(model.model_validate(row))
+        except ValidationError as e:
+            error_list.append({"index": index, "error": e.errors(include_url=False, include_context=False)})
+    return valid_row_list, error_list
+
+
+@note.post("/note_write_batch", response_model=BatchWriteResponse)
+async def note_write_batch(request: Request, request_params: List[Dict[str, Any]], db_conn=Depends(get_db_conn)):
+    """
+    记录批量写入, 每行格式同 note_write, 使用 COPY 在一个事务内写入
+    任意一行校验失败时不写入, 返回每个失败行的行号及错误信息
+    """
+    note_list, error_list = _validate_batch_rows(request_params, NoteWriteRequest)
+    if error_list:
+        return {"insert_number": 0, "error_list": error_list}
+
+    await NoteData(db_conn).note_insert_batch([(i.main_ts_code, i.ts_code, i.freq_code, i.trade_date, i.note) for i in note_list])
+    return {"insert_number": len(note_list), "error_list": []}
+
+
+@note.post("/bs_note_write_batch", response_model=BatchWriteResponse)
+async def bs_note_write_batch(request: Request, request_params: List[Dict[str, Any]], db_conn=Depends(get_db_conn)):
+    """
+    交易记录批量写入, 每行格式同 bs_note_write, 使用 COPY 在一个事务内写入
+    任意一行校验失败时不写入, 返回每个失败行的行号及错误信息
+    """
+    bs_note_list, error_list = _validate_batch_rows(request_params, BsNoteWriteRequest)
+    if error_list:
+        return {"insert_number": 0, "error_list": error_list}
+
+    await NoteData(db_conn).bs_note_insert_batch([(i.main_ts_code, i.ts_code, i.freq_code, i.trade_date, i.trade_type, i.number, i.point, i.note)
+                                                  for i in bs_note_list])
+    return {"insert_number": len(bs_note_list), "error_list": []}
+
+
 class GetNoteRequest(BaseModel):
     main_ts_code: str
     start_date: datetime.date
@@ -70,11 +115,10 @@ class GetNoteResponse(BaseModel):
 
 
 @note.post("/get_note", response_model=List[GetNoteResponse])
-async def get_note(request: Request, request_params: GetNoteRequest):
+async def get_note(request: Request, request_params: GetNoteRequest, db_conn=Depends(get_db_conn)):
     """
     记录查询
     """
-    db_conn = request.state.db_conn
     # start_date, end_date = convert_date_to_datetime(request_params.start_date), convert_date_to_datetime(request_params.end_date)
 
     result = await NoteData(db_conn).get_note(request_params.main_ts_code, request_params.start_date, request_params.end_date)
@@ -99,11 +143,10 @@ class GetBsNoteResponse(BaseModel):
 
 
 @note.post("/get_bs_note", response_model=List[GetBsNoteResponse])
-async def get_bs_note(request: Request, request_params: GetBsNoteRequest):
+async def get_bs_note(request: Request, request_params: GetBsNoteRequest, db_conn=Depends(get_db_conn)):
     """
     交易记录查询
     """
-    db_conn = request.state.db_conn
     # start_date, end_date = convert_date_to_datetime(request_params.start_date), convert_date_to_datetime(request_params.end_date)
 
     result = await NoteData(db_conn).get_bs_note(request_params.main_ts_code, request_params.start_date, request_params.end_date)
@@ -114,33 +157,31 @@ class GetFileNoteRequest(BaseModel):
     file_name: str
 
 
-@note.post("/get_file_note", response_model=str)
-async def get_file_note(request: Request, request_params: GetFileNoteRequest):
-    """
-    读取文件
-    """
-    # aiofiles 异步读取
-    file_path = os.path.join(NOTE_DIR, request_params.file_name)
+def _get_file_note_path(file_name):
+    file_path = os.path.join(NOTE_DIR, file_name)
     if os.path.commonprefix((os.path.realpath(file_path), os.path.realpath(NOTE_DIR))) != NOTE_DIR:
         raise ValueError("文件路径不符合要求")
+    return file_path
 
-    with open(file_path, encoding='utf-8') as f:
-        result = f.read()
 
+@note.post("/get_file_note", response_model=str)
+async def get_file_note(request: Request, request_params: GetFileNoteRequest):
+    """
+    读取文件, 在线程池中读取, 文件未变化时使用缓存
+    """
+    result = await file_note_cache.get_raw(_get_file_note_path(request_params.file_name))
     return result
 
 
 @note.post("/get_file_note_split", response_model=List[str])
 async def get_file_note_split(request: Request, request_params: GetFileNoteRequest):
-    result = await get_file_note(request, request_params)
-    result = list(filter(lambda x: x.strip(), result.split("\n")))
+    result = await file_note_cache.get_split(_get_file_note_path(request_params.file_name))
     return result
 
 
 @note.post("/get_file_note_json")
 async def get_file_note_json(request: Request, request_params: GetFileNoteRequest):
-    result = await get_file_note(request, request_params)
-    result = json.loads(result)
+    result = await file_note_cache.get_json(_get_file_note_path(request_params.file_name))
     return result
 
 
@@ -149,13 +190,11 @@ class GetJsonDataRequest(BaseModel):
 
 
 @note.post("/get_json_data")
-async def get_json_data(request: Request, request_params: GetJsonDataRequest):
+async def get_json_data(request: Request, request_params: GetJsonDataRequest, db_conn=Depends(get_db_conn)):
     """
-    表中json数据查询
+    表中json数据查询, 数据变化前使用缓存
     """
-    db_conn = request.state.db_conn
-
-    result = await NoteData(db_conn).get_json_data(request_params.key_name)
+    result = await json_data_cache.get(db_conn, request_params.key_name)
     return result
 
 
@@ -169,12 +208,10 @@ class GetStrategyResultDataResponse(BaseModel):
 
 
 @note.post("/get_strategy_result_data", response_model=List[GetStrategyResultDataResponse])
-async def get_strategy_result_data(request: Request, request_params: GetStrategyResultDataRequest):
+async def get_strategy_result_data(request: Request, request_params: GetStrategyResultDataRequest, db_conn=Depends(get_db_conn)):
     """
     策略结果表 数据查询
     """
-    db_conn = request.state.db_conn
-
     result_ori = await NoteData(db_conn).get_strategy_result_data(request_params.trade_date)
     result = []
     for strategy_code, strategy_data in result_ori.items():
@@ -1,15 +1,29 @@
 import datetime
-from typing import List, Dict
+from typing import Annotated, List, Dict
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 
-from source.util.util_base.constant import FreqCode
-from source.util.util_base.date_util import convert_date_to_datetime, obj_contain_datetime_convert_to_str
+from source.dependencies import get_db_conn
+from source.util.util_base.constant import FreqCode, PointDataType, StreamFormat
+from source.util.util_base.date_util import convert_date_to_datetime, convert_datetime_to_str
+from source.util.util_base.db import gather_with_pool
+from source.util.util_base.json_util import FastJSONResponse, dumps
+from source.util.util_cache.close_point_index import close_point_index
+from source.util.util_cache.instrument_info import instrument_info
+from source.util.util_cache.response_cache import CacheRoute, cache_response
+from source.util.util_cache.rollover_index import rollover_index
+from source.util.util_cache.trade_calendar import trade_calendar
 from source.util.util_module.point_module import get_main_code_interval_point_data_by_freq_code, get_ts_code_interval_point_data_by_freq_code, \
-    get_ts_code_interval_pure_holding_data
+    get_ts_code_interval_pure_holding_data, get_main_code_bulk_interval_point_data_by_freq_code, get_ts_code_bulk_interval_point_data_by_freq_code, \
+    iter_main_code_interval_point_data_by_freq_code, iter_ts_code_interval_point_data_by_freq_code, refresh_freq_point_data, \
+    get_ts_code_interval_pure_holding_first_n_data
 
-point = APIRouter(prefix="/point", tags=["点位数据"])
+point = APIRouter(prefix="/point", tags=["点位数据"], route_class=CacheRoute)
+
+# 流式返回时每次写出的行数
+STREAM_CHUNK_ROW_NUMBER = 500
 
 
 class MainCodeIntervalPointDataRequest(BaseModel):
@@ -29,25 +43,36 @@ class MainCodeIntervalPointDataResponse(BaseModel):
     vol: int
 
 
+def _format_point_row(date, date_data):
+    """按 response_model 的字段顺序及类型构造, 返回 FastJSONResponse 时不再经过校验"""
+    return {
+        "date": date,
+        "ts_code": date_data["ts_code"],
+        "open": float(date_data["open"]),
+        "high": float(date_data["high"]),
+        "low": float(date_data["low"]),
+        "close": float(date_data["close"]),
+        "vol": int(date_data["vol"])
+    }
+
+
 @point.post("/main_code_interval_point_data", response_model=List[MainCodeIntervalPointDataResponse])
-async def main_code_interval_point_data(request: Request, point_info: MainCodeIntervalPointDataRequest):
+@cache_response
+async def main_code_interval_point_data(request: Request, point_info: MainCodeIntervalPointDataRequest, db_conn=Depends(get_db_conn)):
     # point_info.start_date, point_info.end_date = convert_date_to_datetime(point_info.start_date), convert_date_to_datetime(point_info.end_date)
-    db_conn = request.state.db_conn
-
     point_data_raw = await get_main_code_interval_point_data_by_freq_code(db_conn, point_info.ts_code, point_info.start_date, point_info.end_date, point_info.freq_code)
     point_data = []
     for date, date_data in point_data_raw.items():
-        point_data.append({
-            "date": date,
-            "ts_code": date_data["ts_code"],
-            "open": date_data["open"],
-            "high": date_data["high"],
-            "low": date_data["low"],
-            "close": date_data["close"],
-            "vol": date_data["vol"]
-        })
+        point_data.append(_format_point_row(date, date_data))
     point_data.sort(key=lambda x: x['date'])
-    return obj_contain_datetime_convert_to_str(point_data)
+    return FastJSONResponse(point_data)
+
+
+@point.get("/main_code_interval_point_data", response_model=List[MainCodeIntervalPointDataResponse])
+@cache_response
+async def main_code_interval_point_data_get(request: Request, point_info: Annotated[MainCodeIntervalPointDataRequest, Query()], db_conn=Depends(get_db_conn)):
+    """参数同 POST /main_code_interval_point_data, 以查询参数传入; 响应带 ETag, 支持条件请求"""
+    return await main_code_interval_point_data(request, point_info, db_conn)
 
 
 class TsCodeIntervalPointDataRequest(BaseModel):
@@ -68,27 +93,160 @@ class TsCodeIntervalPointDataResponse(BaseModel):
 
 
 @point.post("/ts_code_interval_point_data", response_model=List[TsCodeIntervalPointDataResponse])
-async def ts_code_interval_point_data(request: Request, point_info: TsCodeIntervalPointDataRequest):
+@cache_response
+async def ts_code_interval_point_data(request: Request, point_info: TsCodeIntervalPointDataRequest, db_conn=Depends(get_db_conn)):
     """
     表中存在main_code的数据, 所以ts_code可以传main_code
     """
     # point_info.start_date, point_info.end_date = convert_date_to_datetime(point_info.start_date), convert_date_to_datetime(point_info.end_date)
-    db_conn = request.state.db_conn
-
     point_data_raw = await get_ts_code_interval_point_data_by_freq_code(db_conn, point_info.ts_code, point_info.start_date, point_info.end_date, point_info.freq_code)
     point_data = []
     for date, date_data in point_data_raw.items():
-        point_data.append({
-            "date": date,
-            "ts_code": date_data["ts_code"],
-            "open": date_data["open"],
-            "high": date_data["high"],
-            "low": date_data["low"],
-            "close": date_data["close"],
-            "vol": date_data["vol"]
-        })
+        point_data.append(_format_point_row(date, date_data))
     point_data.sort(key=lambda x: x['date'])
-    return obj_contain_datetime_convert_to_str(point_data)
+    return FastJSONResponse(point_data)
+
+
+@point.get("/ts_code_interval_point_data", response_model=List[TsCodeIntervalPointDataResponse])
+@cache_response
+async def ts_code_interval_point_data_get(request: Request, point_info: Annotated[TsCodeIntervalPointDataRequest, Query()], db_conn=Depends(get_db_conn)):
+    """参数同 POST /ts_code_interval_point_data, 以查询参数传入; 响应带 ETag, 支持条件请求"""
+    return await ts_code_interval_point_data(request, point_info, db_conn)
+
+
+class IntervalPointDataStreamRequest(BaseModel):
+    start_date: datetime.date
+    end_date: datetime.date
+    ts_code: str = Field(..., example="A.DCE")
+    freq_code: FreqCode
+    stream_format: StreamFormat = StreamFormat.NDJSON
+
+
+async def _stream_point_data(db_pool, iter_point_data_func, point_info):
+    """
+    在生成器内单独获取连接, 连接只在流式输出期间占用
+    ndjson 每行一条数据, json 输出为分块的 JSON 数组
+    """
+    async with db_pool.acquire() as db_conn:
+        chunk, first_row_flag = [], True
+        if point_info.stream_format is StreamFormat.JSON:
+            chunk.append("[")
+
+        async for row in iter_point_data_func(db_conn, point_info.ts_code, point_info.start_date, point_info.end_date, point_info.freq_code):
+            row_str = dumps(row)
+            if point_info.stream_format is StreamFormat.NDJSON:
+                chunk.append(row_str + "\n")
+            else:
+                chunk.append(row_str if first_row_flag else "," + row_str)
+            first_row_flag = False
+
+            if len(chunk) >= STREAM_CHUNK_ROW_NUMBER:
+                yield "".join(chunk)
+                chunk = []
+
+        if point_info.stream_format is StreamFormat.JSON:
+            chunk.append("]")
+        if chunk:
+            yield "".join(chunk)
+
+
+def _get_stream_media_type(stream_format):
+    return "application/x-ndjson" if stream_format is StreamFormat.NDJSON else "application/json"
+
+
+@point.post("/main_code_interval_point_data_stream")
+async def main_code_interval_point_data_stream(request: Request, point_info: IntervalPointDataStreamRequest):
+    """
+    流式返回主力连续点位数据, 使用服务端游标分页读取, 内存占用与日期范围无关
+    数据格式同 /main_code_interval_point_data, stream_format=ndjson 时每行一条, json 时为 JSON 数组
+    """
+    return StreamingResponse(_stream_point_data(request.app.state.db_pool, iter_main_code_interval_point_data_by_freq_code, point_info),
+                             media_type=_get_stream_media_type(point_info.stream_format))
+
+
+@point.post("/ts_code_interval_point_data_stream")
+async def ts_code_interval_point_data_stream(request: Request, point_info: IntervalPointDataStreamRequest):
+    """
+    流式返回点位数据, 表中存在main_code的数据, 所以ts_code可以传main_code
+    数据格式同 /ts_code_interval_point_data, stream_format=ndjson 时每行一条, json 时为 JSON 数组
+    """
+    return StreamingResponse(_stream_point_data(request.app.state.db_pool, iter_ts_code_interval_point_data_by_freq_code, point_info),
+                             media_type=_get_stream_media_type(point_info.stream_format))
+
+
+class BulkIntervalPointDataRequest(BaseModel):
+    start_date: datetime.date
+    end_date: datetime.date
+    ts_code_list: List[str] = Field(..., example=["A.DCE", "B.DCE"])
+    freq_code: FreqCode
+
+
+class BulkIntervalPointDataResponse(BaseModel):
+    ts_code: str
+    data: List[TsCodeIntervalPointDataResponse]
+
+
+def _format_bulk_point_data(ts_code_list, bulk_point_data_raw):
+    result = []
+    for ts_code in dict.fromkeys(ts_code_list):
+        result.append({"ts_code": ts_code, "data": []})
+        for date, date_data in bulk_point_data_raw.get(ts_code, {}).items():
+            result[-1]["data"].append(_format_point_row(date, date_data))
+        result[-1]["data"].sort(key=lambda x: x['date'])
+    return result
+
+
+@point.post("/main_code_bulk_interval_point_data", response_model=List[BulkIntervalPointDataResponse])
+@cache_response
+async def main_code_bulk_interval_point_data(request: Request, point_info: BulkIntervalPointDataRequest, db_conn=Depends(get_db_conn)):
+    """
+    一次获取多个品种的主力连续点位数据, 单次查询完成
+    :return:
+    ```
+    [
+        {
+            ts_code: A.DCE,
+            data: [{date: 2021-04-02, ts_code: A2105.DCE, open: 5660, high: 5710, low: 5620, close: 5700, vol: 123456}, ...]
+        },
+        ...
+    ]
+    ```
+    """
+    point_data_raw = await get_main_code_bulk_interval_point_data_by_freq_code(db_conn, point_info.ts_code_list, point_info.start_date, point_info.end_date,
+                                                                               point_info.freq_code)
+    return FastJSONResponse(_format_bulk_point_data(point_info.ts_code_list, point_data_raw))
+
+
+@point.post("/ts_code_bulk_interval_point_data", response_model=List[BulkIntervalPointDataResponse])
+@cache_response
+async def ts_code_bulk_interval_point_data(request: Request, point_info: BulkIntervalPointDataRequest, db_conn=Depends(get_db_conn)):
+    """
+    一次获取多个 ts_code 的点位数据, 单次查询完成, 表中存在main_code的数据, 所以ts_code可以传main_code
+    """
+    point_data_raw = await get_ts_code_bulk_interval_point_data_by_freq_code(db_conn, point_info.ts_code_list, point_info.start_date, point_info.end_date,
+                                                                             point_info.freq_code)
+    return FastJSONResponse(_format_bulk_point_data(point_info.ts_code_list, point_data_raw))
+
+
+class RefreshFreqPointDataRequest(BaseModel):
+    ts_code_list: List[str] = Field(..., example=["A.DCE", "B.DCE"])
+    data_type: PointDataType = Field(..., example="main")
+
+
+@point.post("/refresh_freq_point_data", response_model=None)
+async def refresh_freq_point_data_job(request: Request, refresh_info: RefreshFreqPointDataRequest):
+    """
+    日线数据入库后调用, 增量刷新周/月线存储, 只重新计算每个代码最后一个周期及之后的数据
+    同时使交易日历, 换约索引, 品种元数据及收盘价索引失效, 下次使用时重新加载
+    data_type: main 主力连续, ts 合约
+    """
+    for cache in (trade_calendar, rollover_index, instrument_info, close_point_index):
+        cache.invalidate()
+
+    await gather_with_pool(
+        request.app.state.db_pool, refresh_freq_point_data,
+        [(ts_code, refresh_info.data_type, freq_code) for ts_code in refresh_info.ts_code_list for freq_code in (FreqCode.WEEK, FreqCode.MONTH)]
+    )
 
 
 class HoldingInfo(BaseModel):
@@ -104,8 +262,33 @@ class TsCodeIntervalPureHoldingDataResponse(BaseModel):
     vol: List[Dict] = Field(..., example=[{"broker": "海通期货", "amount": 18045, "chg": -528, "percent": 0.07219212827755063}])
 
 
+async def _get_pure_holding_data(db_conn, holding_info):
+    holding_data_ori = await get_ts_code_interval_pure_holding_data(db_conn, holding_info.ts_code, holding_info.start_date, holding_info.end_date)
+
+    sum_holding_data = {}
+    for date, date_value in holding_data_ori.items():
+        for key, key_value in date_value.items():
+            sum_holding_data.setdefault(date, {}).setdefault(key, 0)
+            for row in key_value:
+                sum_holding_data[date][key] += row['amount']
+
+    holding_data = []
+    for date, date_value in holding_data_ori.items():
+        for key, key_value in date_value.items():
+            for row in key_value:
+                row['percent'] = row['amount'] / sum_holding_data[date][key]
+
+            key_value.sort(key=lambda x: x['amount'], reverse=True)
+        # 按 response_model 的字段顺序构造, 缺少 long/short/vol 时与校验失败一样报错
+        holding_data.append({"date": date, "long": date_value["long"], "short": date_value["short"], "vol": date_value["vol"]})
+
+    holding_data.sort(key=lambda x: x['date'])
+    return holding_data
+
+
 @point.post("/ts_code_interval_pure_holding_data", response_model=List[TsCodeIntervalPureHoldingDataResponse])
-async def ts_code_interval_pure_holding_data(request: Request, holding_info: HoldingInfo):
+@cache_response
+async def ts_code_interval_pure_holding_data(request: Request, holding_info: HoldingInfo, db_conn=Depends(get_db_conn)):
     """
     表中存在main_code的数据, 所以ts_code可以传main_code
     :param request:
@@ -147,34 +330,12 @@ async def ts_code_interval_pure_holding_data(request: Request, holding_info: Hol
     ```
     """
     # holding_info.start_date, holding_info.end_date = convert_date_to_datetime(holding_info.start_date), convert_date_to_datetime(holding_info.end_date)
-    db_conn = request.state.db_conn
-    holding_data_ori = await get_ts_code_interval_pure_holding_data(db_conn, holding_info.ts_code, holding_info.start_date, holding_info.end_date)
-
-    sum_holding_data = {}
-    for date, date_value in holding_data_ori.items():
-        for key, key_value in date_value.items():
-            sum_holding_data.setdefault(date, {}).setdefault(key, 0)
-            for row in key_value:
-                sum_holding_data[date][key] += row['amount']
-
-    holding_data = []
-    for date, date_value in holding_data_ori.items():
-        holding_data.append({"date": date})
-        for key, key_value in date_value.items():
-            for row in key_value:
-                row['percent'] = row['amount'] / sum_holding_data[date][key]
+    holding_data = await _get_pure_holding_data(db_conn, holding_info)
+    return FastJSONResponse(holding_data)
 
-            key_value.sort(key=lambda x: x['amount'], reverse=True)
-            holding_data[-1][key] = key_value
 
-    holding_data.sort(key=lambda x: x['date'])
-    return obj_contain_datetime_convert_to_str(holding_data)
-
-
-def _sum_hold_data(first_n, data, key):
-    data = data[:first_n]
-    result = sum(i[key] for i in data)
-    return result
+class HoldingFirstNInfo(HoldingInfo):
+    first_n_list: List[int] = Field([1, 3, 20], example=[1, 3, 20])
 
 
 class TsCodeIntervalPureHoldingDataFirstNResponse(BaseModel):
@@ -183,10 +344,11 @@ class TsCodeIntervalPureHoldingDataFirstNResponse(BaseModel):
 
 
 @point.post("/ts_code_interval_pure_holding_data_first_n", response_model=List[TsCodeIntervalPureHoldingDataFirstNResponse])
-async def ts_code_interval_pure_holding_data_first_n(request: Request, holding_info: HoldingInfo):
+@cache_response
+async def ts_code_interval_pure_holding_data_first_n(request: Request, holding_info: HoldingFirstNInfo, db_conn=Depends(get_db_conn)):
     """
     表中存在main_code的数据, 所以ts_code可以传main_code
-    获取品种前N持仓及其占比
+    获取品种前N持仓及其占比, N 由 first_n_list 指定, 默认 [1, 3, 20]
     :param request:
     :param holding_info:
     :return:
@@ -231,21 +393,20 @@ async def ts_code_interval_pure_holding_data_first_n(request: Request, holding_i
         ]
     ```
     """
-    holding_data_ori = await ts_code_interval_pure_holding_data(request, holding_info)
+    first_n_list = list(dict.fromkeys(holding_info.first_n_list))
+    if not first_n_list or min(first_n_list) < 1:
+        raise ValueError("first_n_list 不能为空且必须大于0")
+
+    holding_data_ori = await get_ts_code_interval_pure_holding_first_n_data(db_conn, holding_info.ts_code, holding_info.start_date, holding_info.end_date, first_n_list)
+    holding_data = [{"first_n": first_n, "data": holding_data_ori[first_n]} for first_n in first_n_list]
+    return FastJSONResponse(holding_data)
 
-    holding_data = [{"first_n": 1, "data": []}, {"first_n": 3, "data": []}, {"first_n": 20, "data": []}]
-    for date_value in holding_data_ori:
-        holding_data[0]["data"].append(
-            {"date": date_value["date"], "long": _sum_hold_data(1, date_value['long'], 'amount'), "long_percent": _sum_hold_data(1, date_value['long'], 'percent'),
-             "short": _sum_hold_data(1, date_value['short'], 'amount'), "short_percent": _sum_hold_data(1, date_value['short'], 'percent')})
-        holding_data[1]["data"].append(
-            {"date": date_value["date"], "long": _sum_hold_data(3, date_value['long'], 'amount'), "long_percent": _sum_hold_data(3, date_value['long'], 'percent'),
-             "short": _sum_hold_data(3, date_value['short'], 'amount'), "short_percent": _sum_hold_data(3, date_value['short'], 'percent')})
-        holding_data[2]["data"].append(
-            {"date": date_value["date"], "long": _sum_hold_data(20, date_value['long'], 'amount'), "long_percent": _sum_hold_data(20, date_value['long'], 'percent'),
-             "short": _sum_hold_data(20, date_value['short'], 'amount'), "short_percent": _sum_hold_data(20, date_value['short'], 'percent')})
 
-    return obj_contain_datetime_convert_to_str(holding_data)
+@point.get("/ts_code_interval_pure_holding_data_first_n", response_model=List[TsCodeIntervalPureHoldingDataFirstNResponse])
+@cache_response
+async def ts_code_interval_pure_holding_data_first_n_get(request: Request, holding_info: Annotated[HoldingFirstNInfo, Query()], db_conn=Depends(get_db_conn)):
+    """参数同 POST /ts_code_interval_pure_holding_data_first_n, 以查询参数传入, 列表参数重复传入, 如 first_n_list=1&first_n_list=3; 响应带 ETag, 支持条件请求"""
+    return await ts_code_interval_pure_holding_data_first_n(request, holding_info, db_conn)
 
 
 class TsCodeIntervalPureVolumeDataResponse(BaseModel):
@@ -255,7 +416,8 @@ class TsCodeIntervalPureVolumeDataResponse(BaseModel):
 
 
 @point.post("/ts_code_interval_pure_volume_data", response_model=TsCodeIntervalPureVolumeDataResponse)
-async def ts_code_interval_pure_volume_data(request: Request, holding_info: HoldingInfo):
+@cache_response
+async def ts_code_interval_pure_volume_data(request: Request, holding_info: HoldingInfo, db_conn=Depends(get_db_conn)):
     """
     表中存在main_code的数据, 所以ts_code可以传main_code
     获取品种持仓及其占比, 获取的是在龙虎榜中的占比
@@ -295,8 +457,6 @@ async def ts_code_interval_pure_volume_data(request: Request, holding_info: Hold
     ```
     """
     # holding_info.start_date, holding_info.end_date = convert_date_to_datetime(holding_info.start_date), convert_date_to_datetime(holding_info.end_date)
-    db_conn = request.state.db_conn
-
     holding_data_ori = await get_ts_code_interval_pure_holding_data(db_conn, holding_info.ts_code, holding_info.start_date, holding_info.end_date)
 
     sum_holding_data_ori = {}
@@ -319,6 +479,14 @@ async def ts_code_interval_pure_volume_data(request: Request, holding_info: Hold
             volume_data_formated.setdefault(key, [])
             for row in key_value:
                 volume_data_formated[key].append(row)
-                volume_data_formated[key][-1]['date'] = date
+                volume_data_formated[key][-1]['date'] = convert_datetime_to_str(date)
+
+    # 按 response_model 构造, 没有数据(缺少 long/short/vol)时与校验失败一样报错
+    return FastJSONResponse({key: volume_data_formated[key] for key in ("long", "short", "vol")})
+
 
-    return obj_contain_datetime_convert_to_str(volume_data_formated)
+@point.get("/ts_code_interval_pure_volume_data", response_model=TsCodeIntervalPureVolumeDataResponse)
+@cache_response
+async def ts_code_interval_pure_volume_data_get(request: Request, holding_info: Annotated[HoldingInfo, Query()], db_conn=Depends(get_db_conn)):
+    """参数同 POST /ts_code_interval_pure_volume_data, 以查询参数传入; 响应带 ETag, 支持条件请求"""
+    return await ts_code_interval_pure_volume_data(request, holding_info, db_conn)
@@ -1,16 +1,22 @@
 import datetime
-from typing import List, Dict
+from typing import Annotated, List, Dict, Optional
 
-from fastapi import APIRouter, Request
+import numpy as np
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
 from pydantic import BaseModel, Field
 
+from source.dependencies import get_db_conn
 from source.util.util_base.constant import FreqCode
-from source.util.util_base.date_util import convert_date_to_datetime, obj_contain_datetime_convert_to_str
+from source.util.util_base.date_util import convert_date_to_datetime
+from source.util.util_base.db import gather_with_pool
+from source.util.util_base.json_util import FastJSONResponse
+from source.util.util_cache.response_cache import CacheRoute, cache_response
 from source.util.util_data.basic_info import BasicInfo
-from source.util.util_data.point_data import PointData
-from source.util.util_module.point_module import get_main_code_interval_point_data_by_freq_code, get_ts_code_interval_point_data_by_freq_code
+from source.util.util_module.point_module import get_main_code_interval_point_data_by_freq_code, get_ts_code_interval_point_data_by_freq_code, \
+    get_main_code_point_percent_data, get_main_code_bulk_point_percent_data
+from source.util.util_module.summarize_module import forward_fill_matrix, get_close_point_matrix, get_raise_fall_data, get_spread_matrix, rebase_close_matrix
 
-summarize = APIRouter(prefix="/summarize", tags=["汇总数据"])
+summarize = APIRouter(prefix="/summarize", tags=["汇总数据"], route_class=CacheRoute)
 
 
 class RaiseFallInfoRequest(BaseModel):
@@ -24,54 +30,42 @@ class RaiseFallInfoResponse(BaseModel):
     date: datetime.date
     raise_num: int
     fall_num: int
+    raise_ratio: Optional[float]
+    fall_ratio: Optional[float]
+    ad_line: int
 
 
 @summarize.post("/main_code_interval_raise_fall_data", response_model=List[RaiseFallInfoResponse])
+@cache_response
 async def main_code_interval_raise_fall_data(request: Request, summarize_info: RaiseFallInfoRequest):
     """
-    品种上涨下跌数量, 未取到数据的品种不处理
+    品种上涨下跌数量, 比例及累计涨跌线, 未取到数据的品种不处理, 持平计为下跌
+    并发查询前归还查询交易日使用的连接, 不在占用连接的同时再从连接池获取连接
     """
     # raise HTTPException(status_code=500, detail="Item not found")
 
     # summarize_info.start_date, summarize_info.end_date = convert_date_to_datetime(summarize_info.start_date), convert_date_to_datetime(summarize_info.end_date)
-    db_conn = request.state.db_conn
-
-    start_date = await BasicInfo(db_conn).get_previous_trade_day(summarize_info.start_date)
+    async with request.app.state.db_pool.acquire() as db_conn:
+        start_date = await BasicInfo(db_conn).get_previous_trade_day(summarize_info.start_date)
     start_date = start_date if start_date else summarize_info.start_date
 
-    ts_code_point_data = {}
-    for ts_code in summarize_info.ts_code_list:
-        ts_code_point_data[ts_code] = await get_main_code_interval_point_data_by_freq_code(db_conn, ts_code, start_date, summarize_info.end_date,
-                                                                                           summarize_info.freq_code)
+    ts_code_point_data_list = await gather_with_pool(
+        request.app.state.db_pool, get_main_code_interval_point_data_by_freq_code,
+        [(ts_code, start_date, summarize_info.end_date, summarize_info.freq_code) for ts_code in summarize_info.ts_code_list]
+    )
+    ts_code_point_data = dict(zip(summarize_info.ts_code_list, ts_code_point_data_list))
+
+    date_list, _, close_matrix = get_close_point_matrix(ts_code_point_data)
+    raise_fall_data = get_raise_fall_data(date_list, close_matrix)
+
+    return FastJSONResponse(raise_fall_data)
 
-    exists_date_list = set()
-    for ts_code, ts_code_data in ts_code_point_data.items():
-        exists_date_list.update(set(list(ts_code_data)))
-    exists_date_list = sorted(list(exists_date_list))
-
-    raise_fall_data = []
-    for index in range(1, len(exists_date_list)):
-        date_now, date_previous = exists_date_list[index], exists_date_list[index - 1]
-        raise_num, fall_num = 0, 0
-        for ts_code, ts_code_data in ts_code_point_data.items():
-            close_now, close_previous = ts_code_data.get(date_now, {}).get("close", None), ts_code_data.get(date_previous, {}).get("close", None)
-
-            # 不处理没取到数据的
-            if close_now is None or close_previous is None:
-                continue
-
-            if close_now > close_previous:
-                raise_num += 1
-            else:
-                fall_num += 1
-
-        raise_fall_data.append({
-            "date": date_now,
-            "raise_num": raise_num,
-            "fall_num": fall_num
-        })
 
-    return obj_contain_datetime_convert_to_str(raise_fall_data)
+@summarize.get("/main_code_interval_raise_fall_data", response_model=List[RaiseFallInfoResponse])
+@cache_response
+async def main_code_interval_raise_fall_data_get(request: Request, summarize_info: Annotated[RaiseFallInfoRequest, Query()]):
+    """参数同 POST /main_code_interval_raise_fall_data, 以查询参数传入, 列表参数重复传入, 如 ts_code_list=A.DCE&ts_code_list=B.DCE; 响应带 ETag, 支持条件请求"""
+    return await main_code_interval_raise_fall_data(request, summarize_info)
 
 
 class PointPercentInfo(BaseModel):
@@ -80,15 +74,71 @@ class PointPercentInfo(BaseModel):
 
 
 @summarize.post("/main_code_point_percent", response_model=float)
-async def main_code_point_percent(request: Request, summarize_info: PointPercentInfo):
+@cache_response
+async def main_code_point_percent(request: Request, summarize_info: PointPercentInfo, db_conn=Depends(get_db_conn)):
     """品种点位在历史点位(10年)位置"""
-    # summarize_info.data_date = convert_date_to_datetime(summarize_info.data_date)
-    db_conn = request.state.db_conn
+    point_percent_data = (await get_main_code_point_percent_data(db_conn, summarize_info.ts_code, [summarize_info.data_date]))[0]
+    if point_percent_data["point_now"] is None:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="未获取到点位数据, ts_code={0}, data_date={1}".format(summarize_info.ts_code, summarize_info.data_date)
+        )
+    if point_percent_data["point_percent"] is None:
+        raise ValueError("最大最小点位相同, ts_code={0}, data_date={1}".format(summarize_info.ts_code, summarize_info.data_date))
+
+    return point_percent_data["point_percent"]
+
+
+class PointPercentHistoryInfo(BaseModel):
+    data_date_list: List[datetime.date]
+    ts_code: str = Field(..., example="A.DCE")
 
-    point_result = await PointData(db_conn).get_future_max_min_now_point_by_main_code(summarize_info.ts_code, summarize_info.data_date - datetime.timedelta(days=3650),
-                                                                                      summarize_info.data_date)
-    point_percent = (point_result["point_now"] - point_result["min_point"]) / (point_result["max_point"] - point_result["min_point"])
-    return point_percent
+
+class PointPercentHistoryResponse(BaseModel):
+    date: datetime.date
+    point_percent: Optional[float]
+    max_point: Optional[float]
+    min_point: Optional[float]
+    point_now: Optional[float]
+
+
+@summarize.post("/main_code_point_percent_history", response_model=List[PointPercentHistoryResponse])
+@cache_response
+async def main_code_point_percent_history(request: Request, summarize_info: PointPercentHistoryInfo, db_conn=Depends(get_db_conn)):
+    """
+    品种点位在历史点位(10年)位置, 一次返回多个日期, 用于绘制百分位历史
+    当前点位未取到或最大最小点位相同时, point_percent 为 null
+    """
+    point_percent_data = await get_main_code_point_percent_data(db_conn, summarize_info.ts_code, sorted(set(summarize_info.data_date_list)))
+    return point_percent_data
+
+
+class BulkPointPercentInfo(BaseModel):
+    data_date: datetime.date
+    ts_code_list: Optional[List[str]] = Field(None, example=["A2105.DCE", "B2105.DCE"])
+
+
+class BulkPointPercentResponse(BaseModel):
+    ts_code: str
+    point_percent: Optional[float]
+    max_point: Optional[float]
+    min_point: Optional[float]
+    point_now: Optional[float]
+
+
+@summarize.post("/main_code_bulk_point_percent", response_model=List[BulkPointPercentResponse])
+@cache_response
+async def main_code_bulk_point_percent(request: Request, summarize_info: BulkPointPercentInfo, db_conn=Depends(get_db_conn)):
+    """
+    多个品种点位在历史点位(10年)位置, ts_code_list 为空时取 data_date 当日全部有效的 ts_code
+    按 point_percent 降序, 无法计算的品种(point_percent 为 null)排在最后
+    """
+    ts_code_list = summarize_info.ts_code_list
+    if not ts_code_list:
+        ts_code_list = await BasicInfo(db_conn).get_active_ts_code(summarize_info.data_date)
+
+    point_percent_data = await get_main_code_bulk_point_percent_data(db_conn, list(dict.fromkeys(ts_code_list)), summarize_info.data_date)
+    return point_percent_data
 
 
 class MainCodeClosePointRequest(BaseModel):
@@ -104,6 +154,7 @@ class MainCodeClosePointResponse(BaseModel):
 
 
 @summarize.post("/main_code_relative_close_point_data", response_model=List[MainCodeClosePointResponse])
+@cache_response
 async def main_code_relative_close_point_data(request: Request, summarize_info: MainCodeClosePointRequest):
     """
     以1000为基准, 获取收盘价的相对值
@@ -125,28 +176,36 @@ async def main_code_relative_close_point_data(request: Request, summarize_info:
     ```
     """
     # summarize_info.start_date, summarize_info.end_date = convert_date_to_datetime(summarize_info.start_date), convert_date_to_datetime(summarize_info.end_date)
-    db_conn = request.state.db_conn
+    ts_code_point_data_list = await gather_with_pool(
+        request.app.state.db_pool, get_main_code_interval_point_data_by_freq_code,
+        [(ts_code, summarize_info.start_date, summarize_info.end_date, summarize_info.freq_code) for ts_code in summarize_info.ts_code_list]
+    )
 
-    ts_code_point_data = {}
-    for ts_code in summarize_info.ts_code_list:
-        ts_code_point_data[ts_code] = await get_main_code_interval_point_data_by_freq_code(db_conn, ts_code, summarize_info.start_date, summarize_info.end_date,
-                                                                                           summarize_info.freq_code)
-        min_date = min(ts_code_point_data[ts_code])
-        min_date_percent = ts_code_point_data[ts_code][min_date]['close'] / 1000
-        for date, date_data in ts_code_point_data[ts_code].items():
-            date_data['close'] = date_data['close'] / min_date_percent - 1000
+    ts_code_point_data = dict(zip(summarize_info.ts_code_list, ts_code_point_data_list))
+    for ts_code, ts_code_data in ts_code_point_data.items():
+        if not ts_code_data:
+            raise ValueError("未获取到点位数据, ts_code={0}".format(ts_code))
 
+    date_list, ts_code_list, close_matrix = get_close_point_matrix(ts_code_point_data)
+    relative_matrix = rebase_close_matrix(close_matrix)
+
+    date_array = np.array(date_list, dtype=object)
     result = []
-    for ts_code, ts_code_data in ts_code_point_data.items():
-        result.append({"ts_code": ts_code, "data": []})
-        for date, date_data in ts_code_data.items():
-            result[-1]["data"].append({
-                "date": date,
-                "point": date_data["close"]
-            })
-        result[-1]["data"].sort(key=lambda x: x["date"])
+    for column_index, ts_code in enumerate(ts_code_list):
+        valid_flag = ~np.isnan(relative_matrix[:, column_index])
+        result.append({
+            "ts_code": ts_code,
+            "data": [{"date": date, "point": point} for date, point in zip(date_array[valid_flag], relative_matrix[valid_flag, column_index].tolist())]
+        })
+
+    return FastJSONResponse(result)
 
-    return obj_contain_datetime_convert_to_str(result)
+
+@summarize.get("/main_code_relative_close_point_data", response_model=List[MainCodeClosePointResponse])
+@cache_response
+async def main_code_relative_close_point_data_get(request: Request, summarize_info: Annotated[MainCodeClosePointRequest, Query()]):
+    """参数同 POST /main_code_relative_close_point_data, 以查询参数传入, 列表参数重复传入, 如 ts_code_list=A.DCE&ts_code_list=B.DCE; 响应带 ETag, 支持条件请求"""
+    return await main_code_relative_close_point_data(request, summarize_info)
 
 
 class TsCodeClosePointDataRelativeByOldestCodeRequest(BaseModel):
@@ -162,6 +221,7 @@ class TsCodeClosePointDataRelativeByOldestCodeResponse(BaseModel):
 
 
 @summarize.post("/ts_code_close_point_data_relative_by_oldest_code", response_model=TsCodeClosePointDataRelativeByOldestCodeResponse)
+@cache_response
 async def ts_code_close_point_data_relative_by_oldest_code(request: Request, summarize_info: TsCodeClosePointDataRelativeByOldestCodeRequest):
     """
     以最远的, 有数的的合约为基准, 获取收盘价的相对值, 基准合约没有的日期, 则放弃
@@ -178,33 +238,27 @@ async def ts_code_close_point_data_relative_by_oldest_code(request: Request, sum
     }
     ```
     """
-    db_conn = request.state.db_conn
-
-    ts_code_point_data = {}
-    for ts_code in summarize_info.ts_code_list:
-        ts_code_point_data[ts_code] = await get_ts_code_interval_point_data_by_freq_code(db_conn, ts_code, summarize_info.start_date, summarize_info.end_date,
-                                                                                         summarize_info.freq_code)
+    ts_code_point_data_list = await gather_with_pool(
+        request.app.state.db_pool, get_ts_code_interval_point_data_by_freq_code,
+        [(ts_code, summarize_info.start_date, summarize_info.end_date, summarize_info.freq_code) for ts_code in summarize_info.ts_code_list]
+    )
+    ts_code_point_data = dict(zip(summarize_info.ts_code_list, ts_code_point_data_list))
     benm_ts_code = min(list(ts_code_point_data))
     benm_ts_code_date_list = sorted(list(ts_code_point_data[benm_ts_code]))
 
-    benm_ts_code_date_set = set(benm_ts_code_date_list)
-    for ts_code, ts_code_data in ts_code_point_data.items():
-        for date_now in list(ts_code_data):
-            if date_now not in benm_ts_code_date_set:
-                ts_code_data.pop(date_now)
+    # 基准合约没有的日期丢弃, 某合约缺失的日期沿用前一个价差, 第一个有数的日期之前为 0
+    _, ts_code_list, close_matrix = get_close_point_matrix(ts_code_point_data, date_list=benm_ts_code_date_list)
+    spread_matrix = forward_fill_matrix(get_spread_matrix(close_matrix, ts_code_list.index(benm_ts_code)), initial_value=0)
 
     ts_code_point_data_format = {"date": benm_ts_code_date_list, "data": []}
-    for ts_code, ts_code_data in ts_code_point_data.items():
-        previous_point = 0
-        ts_code_point_data_now = {"ts_code": ts_code, "point": []}
-        for date_now in benm_ts_code_date_list:
-            if date_now in ts_code_point_data[ts_code]:
-                ts_code_point_data_now["point"].append(ts_code_point_data[ts_code][date_now]["close"] - ts_code_point_data[benm_ts_code][date_now]["close"])
-            else:
-                ts_code_point_data_now["point"].append(previous_point)
+    for column_index, ts_code in enumerate(ts_code_list):
+        ts_code_point_data_format["data"].append({"ts_code": ts_code, "point": spread_matrix[:, column_index].tolist()})
 
-            previous_point = ts_code_point_data_now["point"][-1]
+    return FastJSONResponse(ts_code_point_data_format)
 
-        ts_code_point_data_format["data"].append(ts_code_point_data_now)
 
-    return ts_code_point_data_format
+@summarize.get("/ts_code_close_point_data_relative_by_oldest_code", response_model=TsCodeClosePointDataRelativeByOldestCodeResponse)
+@cache_response
+async def ts_code_close_point_data_relative_by_oldest_code_get(request: Request, summarize_info: Annotated[TsCodeClosePointDataRelativeByOldestCodeRequest, Query()]):
+    """参数同 POST /ts_code_close_point_data_relative_by_oldest_code, 以查询参数传入, 列表参数重复传入, 如 ts_code_list=A.DCE&ts_code_list=B.DCE; 响应带 ETag, 支持条件请求"""
+    return await ts_code_close_point_data_relative_by_oldest_code(request, summarize_info)
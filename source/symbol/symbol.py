@@ -1,13 +1,15 @@
 import datetime
 from typing import List
 
-from fastapi import APIRouter, Request
+from fastapi import APIRouter, Depends, Request
 from pydantic import BaseModel, Field
 
+from source.dependencies import get_db_conn
 from source.util.util_base.date_util import convert_date_to_datetime, obj_contain_datetime_convert_to_str
+from source.util.util_cache.response_cache import CacheRoute, cache_response
 from source.util.util_data.basic_info import BasicInfo
 
-symbol = APIRouter(prefix="/symbol", tags=["产品代码"])
+symbol = APIRouter(prefix="/symbol", tags=["产品代码"], route_class=CacheRoute)
 
 
 class ActiveSymbolInfoRequest(BaseModel):
@@ -21,12 +23,11 @@ class ActiveSymbolInfoResponse(BaseModel):
 
 
 @symbol.post("/active_symbol_info", response_model=List[ActiveSymbolInfoResponse])
-async def active_symbol_info(request: Request, symbol_info: ActiveSymbolInfoRequest):
+@cache_response
+async def active_symbol_info(request: Request, symbol_info: ActiveSymbolInfoRequest, db_conn=Depends(get_db_conn)):
     """
     获取当前生效的ts_code
     """
-    db_conn = request.state.db_conn
-
     # data_date = convert_date_to_datetime(symbol_info.data_date)
 
     active_ts_code_info_raw = await BasicInfo(db_conn).get_active_ts_code_info(symbol_info.data_date)
@@ -46,12 +47,11 @@ class SymbolCodeInfo(BaseModel):
 
 
 @symbol.post("/get_main_ts_code_by_ts_code", response_model=str)
-async def get_main_ts_code_by_ts_code(request: Request, symbol_info: SymbolCodeInfo):
+@cache_response
+async def get_main_ts_code_by_ts_code(request: Request, symbol_info: SymbolCodeInfo, db_conn=Depends(get_db_conn)):
     """
     使用ts_code获取其连续 ts_code 代码
     """
-    db_conn = request.state.db_conn
-
     main_ts_code = await BasicInfo(db_conn).get_main_ts_code_by_ts_code(symbol_info.ts_code)
 
     return main_ts_code
@@ -63,13 +63,12 @@ class SymbolCodeInfo2(BaseModel):
 
 
 @symbol.post("/get_ts_code_by_main_ts_code", response_model=str)
-async def get_ts_code_by_main_ts_code(request: Request, symbol_info: SymbolCodeInfo2):
+@cache_response
+async def get_ts_code_by_main_ts_code(request: Request, symbol_info: SymbolCodeInfo2, db_conn=Depends(get_db_conn)):
     """
     使用连续ts_code代码获取其在日期对应的ts_code
     """
     # symbol_info.data_date = convert_date_to_datetime(symbol_info.data_date)
-    db_conn = request.state.db_conn
-
     ts_code = await BasicInfo(db_conn).get_ts_code_by_main_ts_code(symbol_info.main_ts_code, symbol_info.data_date)
 
     return ts_code
@@ -82,24 +81,14 @@ class SymbolCodeInfo3(BaseModel):
 
 
 @symbol.post("/get_contract_change_date_by_main_ts_code", response_model=List[str])
-async def get_contract_change_date_by_main_ts_code(request: Request, symbol_info: SymbolCodeInfo3):
+@cache_response
+async def get_contract_change_date_by_main_ts_code(request: Request, symbol_info: SymbolCodeInfo3, db_conn=Depends(get_db_conn)):
     """
     获取主力合约换约的日期
     """
     # symbol_info.start_date = convert_date_to_datetime(symbol_info.start_date)
     # symbol_info.end_date = convert_date_to_datetime(symbol_info.end_date)
-    db_conn = request.state.db_conn
-
-    result_ori = await BasicInfo(db_conn).get_ts_code_by_main_ts_code_with_date(symbol_info.main_ts_code, symbol_info.start_date, symbol_info.end_date)
-    result_ori.sort(key=lambda x: x[0])
-
-    date_list = []
-    previous_mapping_ts_code = None
-    for trade_date, mapping_ts_code in result_ori:
-        if mapping_ts_code != previous_mapping_ts_code:
-            date_list.append(trade_date)
-            previous_mapping_ts_code = mapping_ts_code
-    date_list = date_list[1:]
+    date_list = await BasicInfo(db_conn).get_contract_change_date_by_main_ts_code(symbol_info.main_ts_code, symbol_info.start_date, symbol_info.end_date)
 
     return obj_contain_datetime_convert_to_str(date_list)
 
@@ -109,12 +98,11 @@ class SymbolCodeInfo4(BaseModel):
 
 
 @symbol.post("/get_per_unit_by_fut_code", response_model=int)
-async def get_per_unit_by_fut_code(request: Request, symbol_info: SymbolCodeInfo4):
+@cache_response
+async def get_per_unit_by_fut_code(request: Request, symbol_info: SymbolCodeInfo4, db_conn=Depends(get_db_conn)):
     """
     获取单位点位变动价格
     """
-    db_conn = request.state.db_conn
-
     fut_code = symbol_info.main_ts_code.split(".")[0]
     per_unit = await BasicInfo(db_conn).get_per_unit_by_fut_code(fut_code)
     return per_unit
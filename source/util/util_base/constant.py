@@ -12,3 +12,13 @@ class FreqCode(Enum):
     DAY = "D"
     WEEK = "W"
     MONTH = "M"
+
+
+class StreamFormat(Enum):
+    NDJSON = "ndjson"
+    JSON = "json"
+
+
+class PointDataType(Enum):
+    MAIN = "main"  # 主力连续
+    TS = "ts"  # 合约
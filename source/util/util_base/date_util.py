@@ -1,5 +1,7 @@
+import bisect
 import calendar
 import datetime
+import functools
 from typing import List
 
 import numpy as np
@@ -7,6 +9,9 @@ from fastapi import HTTPException, status
 
 from source.util.util_base.constant import FreqCode
 
+# 周期日期计算结果的缓存数量
+PERIOD_CACHE_SIZE = 256
+
 
 def convert_datetime_to_str(date):
     return date.strftime('%Y-%m-%d')
@@ -70,67 +75,67 @@ def get_end_date_by_freq_code(data_date, freq_code):
     if freq_code is FreqCode.DAY:
         return data_date
     elif freq_code is FreqCode.WEEK:
-        for _ in range(8):
-            if data_date.weekday() == 4:
-                return data_date
-            data_date += datetime.timedelta(days=1)
-        else:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="未获取到周末日期, date={0}, freq_code={1}".format(data_date, freq_code))
+        return data_date + datetime.timedelta(days=(4 - data_date.weekday()) % 7)
     elif freq_code is FreqCode.MONTH:
         _, end_day_number_of_month = calendar.monthrange(data_date.year, data_date.month)
-        for _ in range(33):
-            if data_date.day == end_day_number_of_month:
-                return data_date
-            data_date += datetime.timedelta(days=1)
-        else:
-            raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="未获取到月末日期, date={0}, freq_code={1}".format(data_date, freq_code))
+        return data_date.replace(day=end_day_number_of_month)
     else:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="不支持的freq_code={}".format(freq_code))
 
 
-def get_end_date_list_by_freq_code(start_date, end_date, freq_code):
-    """
-    :param freq_code:  D, W, M
-    """
+@functools.lru_cache(maxsize=PERIOD_CACHE_SIZE)
+def _get_end_date_tuple_by_freq_code(start_date, end_date, freq_code):
     end_date = get_end_date_by_freq_code(end_date, freq_code)
 
     end_date_list = []
     if freq_code is FreqCode.DAY:
-        for date_now in get_date_range(start_date, end_date):
-            end_date_list.append(date_now)
+        end_date_list = get_date_range(start_date, end_date)
     elif freq_code is FreqCode.WEEK:
-        for date_now in get_date_range(start_date, end_date):
-            if date_now.weekday() == 4:
-                end_date_list.append(date_now)
+        date_now = get_end_date_by_freq_code(start_date, freq_code)
+        while date_now <= end_date:
+            end_date_list.append(date_now)
+            date_now += datetime.timedelta(days=7)
     elif freq_code is FreqCode.MONTH:
-        for date_now in get_date_range(start_date, end_date):
-            _, end_day_number_of_month = calendar.monthrange(date_now.year, date_now.month)
-            if date_now.day == end_day_number_of_month:
-                end_date_list.append(date_now)
-    else:
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="不支持的freq_code={}".format(freq_code))
+        date_now = get_end_date_by_freq_code(start_date, freq_code)
+        while date_now <= end_date:
+            end_date_list.append(date_now)
+            date_now = get_end_date_by_freq_code(date_now + datetime.timedelta(days=1), freq_code)
 
-    return end_date_list
+    return tuple(end_date_list)
 
 
-def get_interval_date_list_by_freq_code(start_date, end_date, freq_code):
+def get_end_date_list_by_freq_code(start_date, end_date, freq_code):
     """
+    按周期直接计算结束日期, 同一 (start_date, end_date, freq_code) 的结果会被缓存
     :param freq_code:  D, W, M
     """
-    end_date_list = get_end_date_list_by_freq_code(start_date, end_date, freq_code)
+    return list(_get_end_date_tuple_by_freq_code(start_date, end_date, freq_code))
+
+
+@functools.lru_cache(maxsize=PERIOD_CACHE_SIZE)
+def _get_interval_date_tuple_by_freq_code(start_date, end_date, freq_code):
+    end_date_list = _get_end_date_tuple_by_freq_code(start_date, end_date, freq_code)
 
-    start_date = start_date
     interval_date_list = []
     for end_date in end_date_list:
-        interval_date_list.append([start_date, end_date])
+        interval_date_list.append((start_date, end_date))
         start_date = end_date + datetime.timedelta(days=1)
 
-    return interval_date_list
+    return tuple(interval_date_list)
+
+
+def get_interval_date_list_by_freq_code(start_date, end_date, freq_code):
+    """
+    同一 (start_date, end_date, freq_code) 的结果会被缓存
+    :param freq_code:  D, W, M
+    """
+    return [list(i) for i in _get_interval_date_tuple_by_freq_code(start_date, end_date, freq_code)]
 
 
 def adjust_interval_all_date_list_by_exists_date(interval_date_list: List, date_list: List):
     """
     使用 date_list 调整 interval_date_list 使其中的包含所有date_list中符合条件的日期
+    每个区间通过二分查找确定其在 date_list 中的范围, 不修改传入的参数
     :param interval_date_list:  [[start_date, end_date], ...]
     :param date_list: [date1, date2 ...]
     :return: [[start_date, date_2 ... , end_date], ...]
@@ -138,24 +143,15 @@ def adjust_interval_all_date_list_by_exists_date(interval_date_list: List, date_
     if not interval_date_list or not date_list:
         return []
 
-    date_list.sort()
-    interval_date_list.sort(key=lambda x: x[0])
+    date_list = sorted(date_list)
+    interval_date_list = sorted(interval_date_list, key=lambda x: x[0])
 
-    index = 0
     interval_date_list_new = []
     for start_date, end_date in interval_date_list:
-        interval_date_list_now = []
-        for index_now in range(index, len(date_list)):
-            if start_date <= date_list[index_now] <= end_date:
-                interval_date_list_now.append(date_list[index_now])
-            elif date_list[index_now] < start_date:
-                pass
-            elif date_list[index_now] > end_date:
-                index = index_now
-                break
-
-        if interval_date_list_now:
-            interval_date_list_new.append(interval_date_list_now)
+        start_index = bisect.bisect_left(date_list, start_date)
+        end_index = bisect.bisect_right(date_list, end_date)
+        if start_index < end_index:
+            interval_date_list_new.append(date_list[start_index:end_index])
     return interval_date_list_new
 
 
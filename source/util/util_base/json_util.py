@@ -0,0 +1,45 @@
+import datetime
+import decimal
+import json
+from enum import Enum
+
+import numpy as np
+from fastapi.responses import Response
+
+from source.util.util_base.date_util import convert_datetime_to_str
+
+
+def _convert_to_json_type(obj):
+    """json 不能直接处理的类型, 日期统一转为 %Y-%m-%d"""
+    if isinstance(obj, (datetime.datetime, datetime.date)):
+        return convert_datetime_to_str(obj)
+    elif isinstance(obj, decimal.Decimal):
+        return float(obj)
+    elif isinstance(obj, np.integer):
+        return int(obj)
+    elif isinstance(obj, np.floating):
+        return float(obj)
+    elif isinstance(obj, np.bool_):
+        return bool(obj)
+    elif isinstance(obj, (np.ndarray, np.datetime64)):
+        return obj.tolist()
+    elif isinstance(obj, Enum):
+        return obj.value
+    else:
+        raise TypeError("不支持处理的数据类型, type(obj)={0}".format(type(obj)))
+
+
+def dumps(obj):
+    """一次遍历完成序列化, 不需要先用 obj_contain_datetime_convert_to_str 复制整个对象"""
+    return json.dumps(obj, default=_convert_to_json_type, ensure_ascii=False, allow_nan=False, separators=(",", ":"))
+
+
+class FastJSONResponse(Response):
+    """
+    用 dumps 直接序列化为 JSON bytes, 路由返回该对象时 FastAPI 不再按 response_model 校验及序列化
+    只用于已按 response_model 构造的内部数据: 字段顺序与模型一致, 日期为 %Y-%m-%d, float/int 字段已转换为对应类型
+    """
+    media_type = "application/json"
+
+    def render(self, content):
+        return dumps(content).encode("utf-8")
@@ -0,0 +1,38 @@
+import numpy as np
+
+
+def build_sparse_table(value_array, reduce_func):
+    """
+    构建稀疏表, 第 k 层第 i 个元素为 value_array[i: i + 2**k] 的聚合值
+    :param value_array: float, 空值为 NaN
+    :param reduce_func: np.fmax / np.fmin, 忽略空值
+    :return: [level_0_array, level_1_array, ...]
+    """
+    sparse_table = [np.asarray(value_array, dtype=float)]
+    length = 1
+    while length * 2 <= len(value_array):
+        previous_level = sparse_table[-1]
+        sparse_table.append(reduce_func(previous_level[:-length], previous_level[length:]))
+        length *= 2
+    return sparse_table
+
+
+def query_sparse_table(sparse_table, reduce_func, start_index_array, end_index_array):
+    """
+    批量查询闭区间 [start_index, end_index] 的聚合值, 每个区间 O(1)
+    :param start_index_array: 区间开始下标, 需满足 start_index <= end_index
+    :param end_index_array: 区间结束下标(包含)
+    :return: np.ndarray
+    """
+    start_index_array = np.asarray(start_index_array, dtype=np.int64)
+    end_index_array = np.asarray(end_index_array, dtype=np.int64)
+    result = np.full(len(start_index_array), np.nan)
+    if len(start_index_array) == 0:
+        return result
+
+    level_array = np.floor(np.log2(end_index_array - start_index_array + 1)).astype(np.int64)
+    for level in np.unique(level_array):
+        flag = level_array == level
+        level_value = sparse_table[level]
+        result[flag] = reduce_func(level_value[start_index_array[flag]], level_value[end_index_array[flag] - (1 << int(level)) + 1])
+    return result
@@ -0,0 +1,65 @@
+import numpy as np
+
+
+def get_period_group_index(date_array, period_end_date_array):
+    """
+    按周期结束日期对交易日期分组
+    :param date_array: 交易日期, 升序, np.datetime64[D]
+    :param period_end_date_array: 周期结束日期, 升序, np.datetime64[D]
+    :return: (start_index_array, end_index_array) 每个有数据的周期在 date_array 中的首尾下标
+    """
+    empty_index = np.array([], dtype=np.int64)
+    if len(date_array) == 0 or len(period_end_date_array) == 0:
+        return empty_index, empty_index
+
+    # 晚于最后一个周期结束日期的数据不属于任何周期
+    date_number = int(np.searchsorted(date_array, period_end_date_array[-1], side="right"))
+    if date_number == 0:
+        return empty_index, empty_index
+
+    period_index = np.searchsorted(period_end_date_array, date_array[:date_number], side="left")
+    boundary_index = np.flatnonzero(np.diff(period_index)) + 1
+    start_index_array = np.concatenate(([0], boundary_index)).astype(np.int64)
+    end_index_array = np.concatenate((boundary_index - 1, [date_number - 1])).astype(np.int64)
+
+    return start_index_array, end_index_array
+
+
+def resample_ohlcv(date_array, open_array, high_array, low_array, close_array, vol_array, period_end_date_array):
+    """
+    将日线数据按周期聚合为 OHLCV, 开盘价或收盘价为空的周期不返回
+    高低点忽略空值(NaN), 成交量取周期最后一个交易日的值
+    :param date_array: 交易日期, 升序, np.datetime64[D]
+    :param open_array: 开盘价, float 或 int64, 空值为 NaN, 下同
+    :param period_end_date_array: 周期结束日期, 升序, np.datetime64[D]
+    :return: {"date": [...], "start_index": [...], "end_index": [...], "open": [...], "high": [...], "low": [...], "close": [...], "vol": [...]}
+    """
+    start_index_array, end_index_array = get_period_group_index(date_array, period_end_date_array)
+    if len(start_index_array) == 0:
+        return {
+            "date": np.array([], dtype="datetime64[D]"),
+            "start_index": start_index_array,
+            "end_index": end_index_array,
+            "open": np.array([], dtype=float),
+            "high": np.array([], dtype=float),
+            "low": np.array([], dtype=float),
+            "close": np.array([], dtype=float),
+            "vol": np.array([], dtype=float)
+        }
+
+    date_number = end_index_array[-1] + 1
+    high_array = np.fmax.reduceat(high_array[:date_number], start_index_array)
+    low_array = np.fmin.reduceat(low_array[:date_number], start_index_array)
+    open_array, close_array = open_array[start_index_array], close_array[end_index_array]
+
+    valid_flag = ~np.isnan(open_array) & (open_array != 0) & ~np.isnan(close_array) & (close_array != 0)
+    return {
+        "date": date_array[end_index_array][valid_flag],
+        "start_index": start_index_array[valid_flag],
+        "end_index": end_index_array[valid_flag],
+        "open": open_array[valid_flag],
+        "high": high_array[valid_flag],
+        "low": low_array[valid_flag],
+        "close": close_array[valid_flag],
+        "vol": vol_array[end_index_array][valid_flag]
+    }
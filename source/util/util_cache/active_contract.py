@@ -0,0 +1,66 @@
+import re
+from collections import OrderedDict
+
+from source.util.util_cache.instrument_info import instrument_info
+from source.util.util_cache.rollover_index import rollover_index
+from source.util.util_cache.trade_calendar import trade_calendar
+
+# 缓存的交易日数上限
+ACTIVE_CONTRACT_CACHE_SIZE = 32
+# 代码中的品种字母前缀, 如 A2105.DCE -> A
+PRODUCT_PREFIX_PATTERN = re.compile(r'[A-Z]*')
+
+
+def _get_product_prefix(code):
+    return PRODUCT_PREFIX_PATTERN.match(code.split('.')[0]).group(0)
+
+
+class ActiveContractSnapshot:
+    """
+    每个交易日的有效合约快照, 由换约索引及品种元数据计算, 首次访问时生成
+    换约索引或品种元数据刷新后, 快照在下次访问时重新生成
+    """
+
+    def __init__(self, max_size=ACTIVE_CONTRACT_CACHE_SIZE):
+        self.max_size = max_size
+        self.snapshot_dict = OrderedDict()
+
+    async def get(self, db_conn, data_date):
+        """
+        :return: {"trade_date": 交易日, "ts_code_list": [ts_code, ...], "ts_code_info_list": [[ts_code, exchange, name], ...]}
+        """
+        await trade_calendar.refresh(db_conn)
+        await rollover_index.refresh(db_conn)
+        await instrument_info.refresh(db_conn)
+        trade_date = trade_calendar.get_active_trade_day(data_date)
+        version = (rollover_index.version, instrument_info.refresh_time)
+
+        snapshot = self.snapshot_dict.get(trade_date)
+        if snapshot is None or snapshot["version"] != version:
+            snapshot = self._build(trade_date, version)
+            self.snapshot_dict[trade_date] = snapshot
+
+        self.snapshot_dict.move_to_end(trade_date)
+        while len(self.snapshot_dict) > self.max_size:
+            self.snapshot_dict.popitem(last=False)
+        return snapshot
+
+    @staticmethod
+    def _build(trade_date, version):
+        ts_code_set = set()
+        if trade_date is not None:
+            for main_ts_code, ts_code in rollover_index.get_mapping_data_by_date(trade_date):
+                if _get_product_prefix(ts_code) == _get_product_prefix(main_ts_code):
+                    ts_code_set.add(ts_code)
+        ts_code_list = sorted(ts_code_set)
+
+        ts_code_info_list = []
+        for ts_code in ts_code_list:
+            future_info = instrument_info.get_future_info(ts_code)
+            if future_info is not None:
+                ts_code_info_list.append([ts_code, future_info["exchange"], future_info["name"]])
+
+        return {"trade_date": trade_date, "version": version, "ts_code_list": ts_code_list, "ts_code_info_list": ts_code_info_list}
+
+
+active_contract_snapshot = ActiveContractSnapshot()
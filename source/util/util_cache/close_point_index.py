@@ -0,0 +1,158 @@
+import asyncio
+import datetime
+import time
+
+import numpy as np
+
+from source.util.util_base.range_extrema_util import build_sparse_table, query_sparse_table
+from source.util.util_cache.rollover_index import rollover_index
+from source.util.util_data.point_data import PointData
+
+# 全量加载的开始日期
+HISTORY_START_DATE = datetime.date(2000, 1, 1)
+# 已加载代码增量读取的最小间隔, 秒
+REFRESH_INTERVAL = 300
+
+
+class _ClosePointSeries:
+    """单个主力连续代码的收盘价序列及其最大, 最小值稀疏表"""
+
+    def __init__(self):
+        self.date_array = np.array([], dtype="datetime64[D]")
+        self.close_array = np.array([], dtype=float)
+        self.max_sparse_table = []
+        self.min_sparse_table = []
+
+    def update(self, date_array, close_array):
+        """用 date_array[0] 及之后的数据替换已有的尾部数据, 有变化时重建稀疏表"""
+        if len(date_array) == 0:
+            return
+
+        keep_number = int(np.searchsorted(self.date_array, date_array[0], side="left"))
+        if np.array_equal(self.date_array[keep_number:], date_array) and np.array_equal(self.close_array[keep_number:], close_array, equal_nan=True):
+            return
+
+        self.date_array = np.concatenate((self.date_array[:keep_number], date_array))
+        self.close_array = np.concatenate((self.close_array[:keep_number], close_array))
+        self.max_sparse_table = build_sparse_table(self.close_array, np.fmax)
+        self.min_sparse_table = build_sparse_table(self.close_array, np.fmin)
+
+    def get_max_min_now_point(self, start_date_array, end_date_array):
+        """
+        每个 [start_date, end_date] 区间的最大, 最小收盘价(忽略空值), 以及 end_date 当日或之前最近一个交易日的收盘价及其日期
+        区间内没有数据的位置为 NaN / NaT
+        """
+        start_index_array = np.searchsorted(self.date_array, start_date_array, side="left")
+        end_index_array = np.searchsorted(self.date_array, end_date_array, side="right") - 1
+        valid_flag = start_index_array <= end_index_array
+
+        max_point_array = np.full(len(start_index_array), np.nan)
+        min_point_array = np.full(len(start_index_array), np.nan)
+        max_point_array[valid_flag] = query_sparse_table(self.max_sparse_table, np.fmax, start_index_array[valid_flag], end_index_array[valid_flag])
+        min_point_array[valid_flag] = query_sparse_table(self.min_sparse_table, np.fmin, start_index_array[valid_flag], end_index_array[valid_flag])
+
+        now_flag = end_index_array >= 0
+        point_now_array = np.full(len(end_index_array), np.nan)
+        point_now_date_array = np.full(len(end_index_array), np.datetime64("NaT"), dtype="datetime64[D]")
+        point_now_array[now_flag] = self.close_array[end_index_array[now_flag]]
+        point_now_date_array[now_flag] = self.date_array[end_index_array[now_flag]]
+        return max_point_array, min_point_array, point_now_array, point_now_date_array
+
+
+class ClosePointIndex:
+    """
+    进程内主力连续收盘价索引, 以主力连续代码为键, 传入合约代码时按换约索引转换为对应的主力连续代码
+    首次查询时全量加载, 之后按 REFRESH_INTERVAL 或调用 invalidate 后只增量读取最后一个已加载交易日及之后的数据, 多个代码合并为一次批量查询
+    任意窗口的最大, 最小收盘价由稀疏表 O(1) 得到
+    """
+
+    def __init__(self):
+        self.series_dict = {}
+        # {main_ts_code: 最近一次加载的时间}
+        self.load_time_dict = {}
+        # 最近一次调用 invalidate 的时间, 在此之前开始的加载视为过期
+        self.invalidate_time = None
+        # 首次刷新时创建, 同一时间只有一个请求加载
+        self.lock = None
+
+    def _is_fresh(self, main_ts_code, now):
+        load_time = self.load_time_dict.get(main_ts_code)
+        if load_time is None or now - load_time >= REFRESH_INTERVAL:
+            return False
+        return self.invalidate_time is None or load_time > self.invalidate_time
+
+    def _get_stale_main_ts_code_list(self, main_ts_code_set):
+        now = time.monotonic()
+        return [i for i in main_ts_code_set if not self._is_fresh(i, now)]
+
+    async def refresh(self, db_conn, code_list):
+        """:return: {code: _ClosePointSeries}, 未找到主力连续代码的 code 不返回"""
+        await rollover_index.refresh(db_conn)
+        code_main_ts_code_dict = {}
+        for code in code_list:
+            main_ts_code = rollover_index.get_shortest_main_ts_code(code)
+            if main_ts_code is not None:
+                code_main_ts_code_dict[code] = main_ts_code
+
+        main_ts_code_set = set(code_main_ts_code_dict.values())
+        if self._get_stale_main_ts_code_list(main_ts_code_set):
+            if self.lock is None:
+                self.lock = asyncio.Lock()
+            async with self.lock:
+                # 等待期间其他请求可能已经加载了部分代码
+                await self._load(db_conn, self._get_stale_main_ts_code_list(main_ts_code_set))
+
+        return {code: self.series_dict.setdefault(main_ts_code, _ClosePointSeries()) for code, main_ts_code in code_main_ts_code_dict.items()}
+
+    def invalidate(self):
+        """数据入库后调用, 下次查询时增量读取, 不等待 REFRESH_INTERVAL"""
+        self.invalidate_time = time.monotonic()
+
+    async def _load(self, db_conn, main_ts_code_list):
+        # 已加载的代码与未加载的代码分别批量读取, {是否已加载: {main_ts_code: 开始日期}}
+        load_group_dict = {}
+        for main_ts_code in main_ts_code_list:
+            series = self.series_dict.get(main_ts_code)
+            loaded = series is not None and len(series.date_array) > 0
+            load_group_dict.setdefault(loaded, {})[main_ts_code] = series.date_array[-1].item() if loaded else HISTORY_START_DATE
+
+        # 加载时间取开始加载的时间, 加载期间调用 invalidate 时下次仍会重新读取
+        load_time = time.monotonic()
+        for main_ts_code_start_date_dict in load_group_dict.values():
+            start_date = min(main_ts_code_start_date_dict.values())
+            bulk_data = await PointData(db_conn).get_future_interval_point_data_by_main_code_bulk(
+                sorted(main_ts_code_start_date_dict), start_date, datetime.date.max, columnar=True)
+
+            for main_ts_code, main_ts_code_start_date in main_ts_code_start_date_dict.items():
+                series = self.series_dict.setdefault(main_ts_code, _ClosePointSeries())
+                if main_ts_code not in bulk_data:
+                    continue
+                date_array, close_array = bulk_data[main_ts_code]["trade_date"], bulk_data[main_ts_code]["close"].astype(float)
+                flag = date_array >= np.datetime64(main_ts_code_start_date)
+                series.update(date_array[flag], close_array[flag])
+
+        for main_ts_code in main_ts_code_list:
+            self.load_time_dict[main_ts_code] = load_time
+
+    async def get_max_min_now_point(self, db_conn, code, start_date_list, end_date_list):
+        """
+        :return: (max_point_array, min_point_array, point_now_array, point_now_date_array)
+        """
+        series = (await self.refresh(db_conn, [code])).get(code, _ClosePointSeries())
+        return series.get_max_min_now_point(np.array(start_date_list, dtype="datetime64[D]"), np.array(end_date_list, dtype="datetime64[D]"))
+
+    async def get_bulk_max_min_now_point(self, db_conn, code_list, start_date, end_date):
+        """
+        :return: {code: (max_point, min_point, point_now, point_now_date)}, 没有数据的 code 各项为 NaN / NaT
+        """
+        code_series_dict = await self.refresh(db_conn, code_list)
+        start_date_array, end_date_array = np.array([start_date], dtype="datetime64[D]"), np.array([end_date], dtype="datetime64[D]")
+
+        result = {}
+        for code in code_list:
+            series = code_series_dict.get(code, _ClosePointSeries())
+            result[code] = tuple(i[0] for i in series.get_max_min_now_point(start_date_array, end_date_array))
+        return result
+
+
+close_point_index = ClosePointIndex()
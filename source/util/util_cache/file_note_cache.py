@@ -0,0 +1,71 @@
+import asyncio
+import json
+import os
+from collections import OrderedDict
+
+# 缓存的文件数上限
+FILE_NOTE_CACHE_SIZE = 64
+
+
+def _read_file(file_path):
+    with open(file_path, encoding='utf-8') as f:
+        return f.read()
+
+
+class _FileNoteEntry:
+    """单个文件版本的原文, 以及按需计算一次的分行和 json 结果"""
+
+    def __init__(self, version, raw):
+        self.version = version
+        self.raw = raw
+        self.split = None
+        self.json = None
+
+    def get_split(self):
+        if self.split is None:
+            self.split = list(filter(lambda x: x.strip(), self.raw.split("\n")))
+        return self.split
+
+    def get_json(self):
+        if self.json is None:
+            self.json = json.loads(self.raw)
+        return self.json
+
+
+class FileNoteCache:
+    """
+    进程内文件记录缓存, 以 (路径, mtime, 文件大小) 判断文件版本, 文件变化后重新读取
+    stat 与读文件在线程池中执行, 不阻塞事件循环
+    """
+
+    def __init__(self, max_size=FILE_NOTE_CACHE_SIZE):
+        self.max_size = max_size
+        self.entry_dict = OrderedDict()
+
+    async def get(self, file_path):
+        loop = asyncio.get_running_loop()
+        stat_result = await loop.run_in_executor(None, os.stat, file_path)
+        version = (stat_result.st_mtime_ns, stat_result.st_size)
+
+        entry = self.entry_dict.get(file_path)
+        if entry is None or entry.version != version:
+            raw = await loop.run_in_executor(None, _read_file, file_path)
+            entry = _FileNoteEntry(version, raw)
+            self.entry_dict[file_path] = entry
+
+        self.entry_dict.move_to_end(file_path)
+        while len(self.entry_dict) > self.max_size:
+            self.entry_dict.popitem(last=False)
+        return entry
+
+    async def get_raw(self, file_path):
+        return (await self.get(file_path)).raw
+
+    async def get_split(self, file_path):
+        return (await self.get(file_path)).get_split()
+
+    async def get_json(self, file_path):
+        return (await self.get(file_path)).get_json()
+
+
+file_note_cache = FileNoteCache()
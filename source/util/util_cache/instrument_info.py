@@ -0,0 +1,100 @@
+import asyncio
+import time
+
+from source.util.util_base.db import get_multi_data, register_statement
+
+# 刷新的最小间隔, 秒
+REFRESH_INTERVAL = 600
+
+GET_STOCK_INFO_SQL = register_statement("instrument_info.get_stock_info", """
+select ts_code, name from s_info
+""")
+GET_FUTURE_INFO_SQL = register_statement("instrument_info.get_future_info", """
+select ts_code, symbol, exchange, name, fut_code, per_unit, list_date from future_basic_info_data
+""")
+
+
+class InstrumentInfo:
+    """
+    进程内品种元数据字典, 由 future_basic_info_data 及 s_info 构建, 按 REFRESH_INTERVAL 或调用 invalidate 后全量刷新
+    代码 -> 名称, 交易所, 每点价格, 品种代码
+    """
+
+    def __init__(self):
+        self.future_info_dict = {}
+        self.name_dict = {}
+        self.symbol_ts_code_dict = {}
+        self.fut_code_per_unit_dict = {}
+        self.refresh_time = None
+        # 最近一次调用 invalidate 的时间, 在此之前开始的加载视为过期
+        self.invalidate_time = None
+        # 首次刷新时创建, 同一时间只有一个请求重新加载
+        self.lock = None
+
+    def _is_fresh(self):
+        if self.refresh_time is None or time.monotonic() - self.refresh_time >= REFRESH_INTERVAL:
+            return False
+        return self.invalidate_time is None or self.refresh_time > self.invalidate_time
+
+    async def refresh(self, db_conn, force=False):
+        if not force and self._is_fresh():
+            return
+
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            # 等待期间其他请求可能已经完成加载
+            if not force and self._is_fresh():
+                return
+            await self._load(db_conn)
+
+    def invalidate(self):
+        """数据入库后调用, 下次使用时重新加载"""
+        self.invalidate_time = time.monotonic()
+
+    async def _load(self, db_conn):
+        # 刷新时间取开始加载的时间, 加载期间调用 invalidate 时下次仍会重新加载
+        load_time = time.monotonic()
+        sql = GET_STOCK_INFO_SQL
+        stock_info = await get_multi_data(db_conn, sql)
+        sql = GET_FUTURE_INFO_SQL
+        future_info = await get_multi_data(db_conn, sql)
+
+        future_info_dict, name_dict, symbol_ts_code_dict = {}, {}, {}
+        fut_code_per_unit_list_dict = {}
+        for ts_code, name in stock_info:
+            name_dict[ts_code] = name
+        for ts_code, symbol, exchange, name, fut_code, per_unit, list_date in future_info:
+            future_info_dict[ts_code] = {"name": name, "exchange": exchange, "per_unit": per_unit, "fut_code": fut_code, "symbol": symbol}
+            name_dict[ts_code] = name
+            symbol_ts_code_dict.setdefault(symbol, []).append(ts_code)
+            if per_unit is not None:
+                fut_code_per_unit_list_dict.setdefault(fut_code, []).append((list_date, per_unit))
+
+        # 与 order by list_date desc 取第一个一致, list_date 为空的排在最前
+        fut_code_per_unit_dict = {}
+        for fut_code, per_unit_list in fut_code_per_unit_list_dict.items():
+            fut_code_per_unit_dict[fut_code] = max(per_unit_list, key=lambda x: (x[0] is None, x[0]))[1]
+
+        self.future_info_dict = future_info_dict
+        self.name_dict = name_dict
+        self.symbol_ts_code_dict = symbol_ts_code_dict
+        self.fut_code_per_unit_dict = fut_code_per_unit_dict
+        self.refresh_time = load_time
+
+    def get_name(self, code):
+        return self.name_dict.get(code)
+
+    def get_future_info(self, ts_code):
+        """{"name", "exchange", "per_unit", "fut_code", "symbol"}, 不存在时返回 None"""
+        return self.future_info_dict.get(ts_code)
+
+    def get_ts_code_list_by_symbol(self, symbol):
+        return self.symbol_ts_code_dict.get(symbol, [])
+
+    def get_per_unit_by_fut_code(self, fut_code):
+        """上市日期最新的一条 per_unit 不为空的数据"""
+        return self.fut_code_per_unit_dict.get(fut_code)
+
+
+instrument_info = InstrumentInfo()
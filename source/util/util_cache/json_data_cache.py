@@ -0,0 +1,121 @@
+"""
+json_data 表的进程内缓存, 通过 LISTEN json_data_change 失效
+通知由 migration/002_create_json_data_notify_trigger.sql 创建的触发器发出, 连接时检查触发器是否存在, 不存在时不使用缓存
+"""
+import asyncio
+import time
+
+from fastapi.logger import logger
+
+from source.util.util_base.db import create_db_conn, get_single_value, register_statement
+from source.util.util_data.note_data import NoteData
+
+JSON_DATA_CHANNEL = "json_data_change"
+# 检查监听连接状态及断开后重新连接的间隔, 秒
+RECONNECT_INTERVAL = 30
+# 缓存条目的最长有效时间, 秒, 通知丢失时数据最多过期这么久
+JSON_DATA_CACHE_TTL = 300
+
+CHECK_TRIGGER_SQL = register_statement("json_data_cache.check_trigger", """
+select count(1) from pg_trigger where tgrelid = 'json_data'::regclass and tgname = 'json_data_change'
+""")
+
+
+class JsonDataCache:
+    """
+    以 name 为键缓存解析后的 json_data, 收到 NOTIFY 后删除对应条目, payload 为空时清空全部, 条目超过 JSON_DATA_CACHE_TTL 后重新查询
+    LISTEN 使用单独的连接, 连接池归还连接时会执行 UNLISTEN *; 未处于监听状态时不使用缓存
+    连接及断开后的重新连接在后台任务中进行, 请求处理过程中不建立连接
+    """
+
+    def __init__(self):
+        # {name: (加载时间, 数据)}
+        self.data_dict = {}
+        self.listen_conn = None
+        self.listening = False
+        self.listen_task = None
+        # 每次失效加一, 查询期间收到通知时不写入缓存
+        self.generation = 0
+
+    async def _connect(self):
+        await self._close_conn()
+        try:
+            self.listen_conn = await create_db_conn()
+            if not await get_single_value(self.listen_conn, CHECK_TRIGGER_SQL):
+                logger.warning("json_data 未创建 json_data_change 触发器, 不使用缓存")
+                await self._close_conn()
+                return
+            self.listen_conn.add_termination_listener(self._on_terminate)
+            await self.listen_conn.add_listener(JSON_DATA_CHANNEL, self._on_notify)
+        except Exception as e:
+            logger.warning("json_data 监听启动失败, 不使用缓存, error={0}".format(e))
+            await self._close_conn()
+            return
+
+        # 未监听期间的变化没有收到通知, 重新连接后清空缓存
+        self._invalidate()
+        self.listening = True
+
+    async def _listen_forever(self):
+        while True:
+            if not self.listening:
+                await self._connect()
+            await asyncio.sleep(RECONNECT_INTERVAL)
+
+    def start(self):
+        """启动时调用, 在后台任务中建立监听连接, 断开后按 RECONNECT_INTERVAL 重新连接"""
+        if self.listen_task is None:
+            self.listen_task = asyncio.create_task(self._listen_forever())
+
+    async def close(self):
+        if self.listen_task is not None:
+            self.listen_task.cancel()
+            try:
+                await self.listen_task
+            except asyncio.CancelledError:
+                pass
+            self.listen_task = None
+        await self._close_conn()
+
+    async def _close_conn(self):
+        self.listening = False
+        listen_conn, self.listen_conn = self.listen_conn, None
+        if listen_conn is not None and not listen_conn.is_closed():
+            try:
+                await listen_conn.close()
+            except Exception as e:
+                logger.warning("json_data 监听连接关闭失败, error={0}".format(e))
+
+    def _on_notify(self, connection, pid, channel, payload):
+        self._invalidate(payload or None)
+
+    def _on_terminate(self, connection):
+        # 主动关闭的旧连接不影响当前的监听状态
+        if connection is not self.listen_conn:
+            return
+        logger.warning("json_data 监听连接已断开")
+        self.listening = False
+        self._invalidate()
+
+    def _invalidate(self, name=None):
+        self.generation += 1
+        if name is None:
+            self.data_dict.clear()
+        else:
+            self.data_dict.pop(name, None)
+
+    async def get(self, db_conn, name):
+        if self.listening and name in self.data_dict:
+            load_time, result = self.data_dict[name]
+            if time.monotonic() - load_time < JSON_DATA_CACHE_TTL:
+                return result
+
+        generation = self.generation
+        load_time = time.monotonic()
+        result = await NoteData(db_conn).get_json_data(name)
+        if self.listening and generation == self.generation:
+            self.data_dict[name] = (load_time, result)
+        return result
+
+
+json_data_cache = JsonDataCache()
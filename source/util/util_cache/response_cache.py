@@ -0,0 +1,302 @@
+import asyncio
+import datetime
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack
+
+from fastapi import Response, routing
+from fastapi.dependencies.utils import get_dependant, get_parameterless_sub_dependant, solve_dependencies
+from fastapi.exceptions import RequestValidationError
+from fastapi.logger import logger
+from fastapi.routing import APIRoute
+
+from source.util.util_base.constant import FreqCode
+from source.util.util_base.date_util import get_end_date_by_freq_code
+from source.util.util_base.db import get_multi_data, register_statement
+from source.util.util_base.json_util import dumps
+
+# 缓存响应体的总字节数上限
+RESPONSE_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 数据版本的后台刷新间隔, 秒
+DATA_VERSION_REFRESH_INTERVAL = 60
+
+GET_DATA_VERSION_SQL = register_statement("data_version.get_data_version", """
+select max_date, (select count(1) from future_daily_point_data where trade_date = max_date) from (select max(trade_date) max_date from future_daily_point_data) a
+union all
+select max_date, (select count(1) from future_holding_data where trade_date = max_date) from (select max(trade_date) max_date from future_holding_data) a
+union all
+select max_date, (select count(1) from future_main_code_data where trade_date = max_date) from (select max(trade_date) max_date from future_main_code_data) a
+""")
+
+# 请求参数中表示区间结束日期的字段, 按顺序取第一个存在的
+END_DATE_FIELD_LIST = ("end_date", "data_date")
+
+
+def _convert_to_date(date):
+    if isinstance(date, datetime.datetime):
+        return date.date()
+    return date
+
+
+class DataVersion:
+    """
+    日线, 持仓, 主力映射三张表的 (最大交易日, 最大交易日的行数), 任意一项变化即认为有新数据写入
+    settled_date 为三张表最大交易日中最小的一个, 结束日期早于它的区间数据不会再变化
+    """
+
+    def __init__(self):
+        self.version = None
+        self.settled_date = None
+        self.refresh_time = None
+        self.refresh_task = None
+
+    async def refresh(self, db_conn):
+        sql = GET_DATA_VERSION_SQL
+        result = await get_multi_data(db_conn, sql)
+        version = tuple((_convert_to_date(max_date), row_number) for max_date, row_number in result)
+        max_date_list = [max_date for max_date, _ in version if max_date is not None]
+
+        self.version = version
+        self.settled_date = min(max_date_list) if max_date_list else None
+        self.refresh_time = time.monotonic()
+
+    async def _refresh_forever(self, db_pool):
+        while True:
+            try:
+                async with db_pool.acquire() as db_conn:
+                    await self.refresh(db_conn)
+            except Exception as e:
+                logger.warning("数据版本刷新失败, error={0}".format(e))
+            await asyncio.sleep(DATA_VERSION_REFRESH_INTERVAL)
+
+    def start(self, db_pool):
+        """
+        启动时调用, 在后台任务中按 DATA_VERSION_REFRESH_INTERVAL 刷新, 请求处理过程中不查询数据版本
+        后台任务单独获取连接, 不会在请求已占用连接的同时再获取连接
+        """
+        if self.refresh_task is None:
+            self.refresh_task = asyncio.create_task(self._refresh_forever(db_pool))
+
+    async def close(self):
+        if self.refresh_task is not None:
+            self.refresh_task.cancel()
+            try:
+                await self.refresh_task
+            except asyncio.CancelledError:
+                pass
+            self.refresh_task = None
+
+    def is_settled(self, end_date, freq_code=None):
+        """
+        结束日期为 end_date 的区间数据是否不再变化
+        周/月线的最后一个周期包含结束日期所在周期的全部交易日, 按周期的最后一天判断
+        """
+        if end_date is None or self.settled_date is None:
+            return False
+        if freq_code is not None:
+            end_date = get_end_date_by_freq_code(end_date, freq_code)
+        return end_date < self.settled_date
+
+
+class ResponseCache:
+    """
+    进程内响应缓存, 以 (接口, 规范化后的请求参数) 为键, 按 LRU 淘汰, 总字节数不超过 max_byte_size
+    结束日期(周/月线为所在周期的最后一天)早于 settled_date 的区间永久有效(直到被淘汰), 其余条目在数据版本变化后失效
+    """
+
+    def __init__(self, max_byte_size=RESPONSE_CACHE_MAX_BYTES):
+        self.max_byte_size = max_byte_size
+        self.byte_size = 0
+        self.entry_dict = OrderedDict()
+        self.stats = {"hit_count": 0, "miss_count": 0, "eviction_count": 0, "invalidation_count": 0, "not_modified_count": 0}
+
+    def get(self, key, version):
+        """返回缓存的响应体, 不存在或已失效时返回 None"""
+        entry = self.entry_dict.get(key)
+        if entry is None:
+            self.stats["miss_count"] += 1
+            return None
+
+        body, entry_version = entry
+        if entry_version is not None and entry_version != version:
+            self._remove(key)
+            self.stats["invalidation_count"] += 1
+            self.stats["miss_count"] += 1
+            return None
+
+        self.entry_dict.move_to_end(key)
+        self.stats["hit_count"] += 1
+        return body
+
+    def set(self, key, body, version):
+        """version 为 None 表示该条目不随数据版本失效"""
+        if len(body) > self.max_byte_size:
+            return
+
+        if key in self.entry_dict:
+            self._remove(key)
+        self.entry_dict[key] = (body, version)
+        self.byte_size += len(body)
+
+        while self.byte_size > self.max_byte_size:
+            self._remove(next(iter(self.entry_dict)))
+            self.stats["eviction_count"] += 1
+
+    def _remove(self, key):
+        body, _ = self.entry_dict.pop(key)
+        self.byte_size -= len(body)
+
+    def clear(self):
+        self.entry_dict.clear()
+        self.byte_size = 0
+
+    def get_stats(self):
+        return dict(self.stats, entry_count=len(self.entry_dict), byte_size=self.byte_size, max_byte_size=self.max_byte_size)
+
+
+data_version = DataVersion()
+response_cache = ResponseCache()
+
+
+def _get_end_date(request_params):
+    """请求参数中的结束日期, 不存在或不是 %Y-%m-%d 格式时返回 None, 此时条目随数据版本失效"""
+    if not isinstance(request_params, dict):
+        return None
+    for field_name in END_DATE_FIELD_LIST:
+        end_date = request_params.get(field_name)
+        if end_date is not None:
+            try:
+                return datetime.date.fromisoformat(end_date)
+            except (TypeError, ValueError):
+                return None
+    return None
+
+
+def _get_freq_code(request_params):
+    """请求参数中的 freq_code, 不存在或不支持时返回 None"""
+    if not isinstance(request_params, dict):
+        return None
+    try:
+        return FreqCode(request_params.get("freq_code"))
+    except ValueError:
+        return None
+
+
+def _get_query_params(request):
+    """GET 请求的查询参数, 重复出现的参数(如 ts_code_list)按顺序合并为列表"""
+    query_params = {}
+    for name, value in request.query_params.multi_items():
+        query_params.setdefault(name, []).append(value)
+    return {name: value_list[0] if len(value_list) == 1 else value_list for name, value_list in query_params.items()}
+
+
+def _get_etag(key, version):
+    """强 ETag, 由接口, 请求参数(包含代码和日期)及数据版本决定, 已固定的区间不随数据版本变化"""
+    return '"{0}"'.format(hashlib.sha1(dumps([list(key), version]).encode("utf-8")).hexdigest())
+
+
+def _match_etag(if_none_match, etag):
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    for etag_now in if_none_match.split(","):
+        etag_now = etag_now.strip()
+        if etag_now.startswith("W/"):
+            etag_now = etag_now[2:]
+        if etag_now == etag:
+            return True
+    return False
+
+
+def _dependency_endpoint():
+    pass
+
+
+def cache_response(func):
+    """
+    标记接口使用响应缓存, 所在的 APIRouter 需要使用 route_class=CacheRoute
+    POST 接口按请求体缓存; GET 接口按查询参数缓存, 并返回 ETag 支持条件请求
+    """
+    func.cache_response = True
+    return func
+
+
+class CacheRoute(APIRoute):
+    """
+    对 cache_response 标记的接口, 在解析接口参数中的依赖(包括 Depends(get_db_conn))之前按请求体查找缓存, 命中时不占用数据库连接
+    命中时先执行接口及 APIRouter, include_router 上声明的 dependencies(如登录校验), 校验失败时与未使用缓存时一样返回错误
+    未命中时按原流程处理, 响应经过 response_model 校验及序列化后, 只缓存状态码为 200 的响应体
+    GET 请求的响应带 ETag(由接口, 查询参数及数据版本决定), If-None-Match 匹配时直接返回 304, 不查询也不序列化
+    数据版本尚未取得时不使用缓存
+    """
+
+    def _get_effective_route(self):
+        """
+        include_router 时的 dependencies 不在 self.dependencies 中, 与 APIRoute.get_route_handler 一样取 include 后的路由
+        """
+        effective_context_var = getattr(routing, "_effective_route_context_var", None)
+        effective_context = effective_context_var.get() if effective_context_var is not None else None
+        if effective_context is not None and effective_context.original_route is self:
+            return effective_context
+        return self
+
+    def get_route_handler(self):
+        route_handler = super().get_route_handler()
+        if not getattr(self.endpoint, "cache_response", False):
+            return route_handler
+
+        route = self._get_effective_route()
+        dependency_dependant = None
+        if route.dependencies:
+            dependency_dependant = get_dependant(path=self.path_format, call=_dependency_endpoint)
+            for depends in route.dependencies[::-1]:
+                dependency_dependant.dependencies.insert(0, get_parameterless_sub_dependant(depends=depends, path=self.path_format))
+
+        async def solve_route_dependencies(request):
+            async with AsyncExitStack() as async_exit_stack:
+                solved_result = await solve_dependencies(request=request, dependant=dependency_dependant, async_exit_stack=async_exit_stack, embed_body_fields=False,
+                                                         dependency_overrides_provider=route.dependency_overrides_provider)
+            if solved_result.errors:
+                raise RequestValidationError(solved_result.errors)
+
+        async def cache_route_handler(request):
+            version = data_version.version
+            if version is None:
+                return await route_handler(request)
+            if request.method == "GET":
+                request_params = _get_query_params(request)
+            else:
+                try:
+                    request_params = json.loads(await request.body())
+                except ValueError:
+                    return await route_handler(request)
+
+            key = (request.method, self.path, json.dumps(request_params, ensure_ascii=False, sort_keys=True, separators=(",", ":")))
+            settled_flag = data_version.is_settled(_get_end_date(request_params), _get_freq_code(request_params))
+            entry_version = None if settled_flag else version
+            headers = {"ETag": _get_etag(key, entry_version), "Cache-Control": "no-cache"} if request.method == "GET" else None
+
+            if headers is not None and _match_etag(request.headers.get("if-none-match"), headers["ETag"]):
+                if dependency_dependant is not None:
+                    await solve_route_dependencies(request)
+                response_cache.stats["not_modified_count"] += 1
+                return Response(status_code=304, headers=headers)
+
+            body = response_cache.get(key, version)
+            if body is not None:
+                # 只在命中时单独执行, 未命中时由原流程执行, 每个请求只执行一次
+                if dependency_dependant is not None:
+                    await solve_route_dependencies(request)
+                return Response(content=body, media_type="application/json", headers=headers)
+
+            response = await route_handler(request)
+            if response.status_code == 200 and isinstance(getattr(response, "body", None), bytes):
+                response_cache.set(key, response.body, entry_version)
+                if headers is not None:
+                    response.headers.update(headers)
+            return response
+
+        return cache_route_handler
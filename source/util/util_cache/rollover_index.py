@@ -0,0 +1,197 @@
+import asyncio
+import bisect
+import datetime
+import time
+
+from source.util.util_base.db import get_multi_data, register_statement
+
+# 增量刷新的最小间隔, 秒
+REFRESH_INTERVAL = 300
+
+GET_MAIN_CODE_DATA_SQL = register_statement("rollover_index.get_main_code_data", """
+select ts_code, trade_date, mapping_ts_code from future_main_code_data order by ts_code, trade_date
+""")
+GET_MAIN_CODE_DATA_SINCE_SQL = register_statement("rollover_index.get_main_code_data_since", """
+select ts_code, trade_date, mapping_ts_code from future_main_code_data where trade_date >= $1 order by ts_code, trade_date
+""")
+
+
+def _convert_to_date(date):
+    if isinstance(date, datetime.datetime):
+        return date.date()
+    return date
+
+
+class _MainCodeSegment:
+    """单个主力连续代码的换约区间, 区间以 (开始日期, 合约) 表示, 另存全部交易日用于判断当日是否有映射"""
+
+    def __init__(self):
+        self.date_list = []
+        self.segment_start_date_list = []
+        self.segment_ts_code_list = []
+
+    def append(self, trade_date, ts_code):
+        """:return: 是否新增了交易日"""
+        if self.date_list and trade_date <= self.date_list[-1]:
+            return False
+        self.date_list.append(trade_date)
+        if not self.segment_ts_code_list or self.segment_ts_code_list[-1] != ts_code:
+            self.segment_start_date_list.append(trade_date)
+            self.segment_ts_code_list.append(ts_code)
+        return True
+
+    def get_ts_code(self, data_date):
+        index = bisect.bisect_left(self.date_list, data_date)
+        if index == len(self.date_list) or self.date_list[index] != data_date:
+            return None
+        return self.segment_ts_code_list[bisect.bisect_right(self.segment_start_date_list, data_date) - 1]
+
+    def get_interval_data(self, start_date, end_date):
+        """[[trade_date, ts_code], ...]"""
+        start_index = bisect.bisect_left(self.date_list, start_date)
+        end_index = bisect.bisect_right(self.date_list, end_date)
+        if start_index >= end_index:
+            return []
+
+        result = []
+        segment_index = bisect.bisect_right(self.segment_start_date_list, self.date_list[start_index]) - 1
+        for trade_date in self.date_list[start_index:end_index]:
+            while segment_index + 1 < len(self.segment_start_date_list) and self.segment_start_date_list[segment_index + 1] <= trade_date:
+                segment_index += 1
+            result.append([trade_date, self.segment_ts_code_list[segment_index]])
+        return result
+
+    def get_change_date_list(self, start_date, end_date):
+        """区间内第一个交易日之后发生换约的日期"""
+        start_index = bisect.bisect_left(self.date_list, start_date)
+        if start_index == len(self.date_list) or self.date_list[start_index] > end_date:
+            return []
+
+        segment_start_index = bisect.bisect_right(self.segment_start_date_list, self.date_list[start_index])
+        segment_end_index = bisect.bisect_right(self.segment_start_date_list, end_date)
+        return self.segment_start_date_list[segment_start_index:segment_end_index]
+
+
+class RolloverIndex:
+    """
+    进程内主力合约换约索引, 由 future_main_code_data 构建
+    主力连续代码 -> 按开始日期排序的 (start_date, 合约) 区间, 以及合约 -> 主力连续代码 的反向映射
+    首次使用时全量加载, 之后按 REFRESH_INTERVAL 或调用 invalidate 后增量加载新的交易日
+    """
+
+    def __init__(self):
+        self.main_code_segment_dict = {}
+        self.ts_code_main_code_dict = {}
+        self.max_trade_date = None
+        self.refresh_time = None
+        # 每次有新数据加载时加一, 供依赖本索引的缓存判断是否需要重建
+        self.version = 0
+        # 最近一次调用 invalidate 的时间, 在此之前开始的加载视为过期
+        self.invalidate_time = None
+        # 首次刷新时创建, 同一时间只有一个请求加载
+        self.lock = None
+
+    def _is_fresh(self):
+        if self.refresh_time is None or time.monotonic() - self.refresh_time >= REFRESH_INTERVAL:
+            return False
+        return self.invalidate_time is None or self.refresh_time > self.invalidate_time
+
+    async def refresh(self, db_conn, force=False):
+        if not force and self._is_fresh():
+            return
+
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            # 等待期间其他请求可能已经完成加载
+            if not force and self._is_fresh():
+                return
+            await self._load(db_conn)
+
+    def invalidate(self):
+        """数据入库后调用, 下次使用时增量加载, 不等待 REFRESH_INTERVAL"""
+        self.invalidate_time = time.monotonic()
+
+    async def _load(self, db_conn):
+        # 刷新时间取开始加载的时间, 加载期间调用 invalidate 时下次仍会重新加载
+        load_time = time.monotonic()
+        if self.max_trade_date is None:
+            sql = GET_MAIN_CODE_DATA_SQL
+            result = await get_multi_data(db_conn, sql)
+        else:
+            # 同一交易日的数据可能分批写入, 因此从已加载的最大日期开始重新读取, 已存在的日期在 append 时跳过
+            sql = GET_MAIN_CODE_DATA_SINCE_SQL
+            result = await get_multi_data(db_conn, sql, [self.max_trade_date])
+
+        appended = False
+        for main_ts_code, trade_date, ts_code in result:
+            trade_date = _convert_to_date(trade_date)
+            appended = self.main_code_segment_dict.setdefault(main_ts_code, _MainCodeSegment()).append(trade_date, ts_code) or appended
+            self.ts_code_main_code_dict.setdefault(ts_code, set()).add(main_ts_code)
+            if self.max_trade_date is None or trade_date > self.max_trade_date:
+                self.max_trade_date = trade_date
+        if appended:
+            self.version += 1
+        self.refresh_time = load_time
+
+    def get_ts_code_by_main_ts_code(self, main_ts_code, data_date):
+        segment = self.main_code_segment_dict.get(main_ts_code)
+        return segment.get_ts_code(_convert_to_date(data_date)) if segment else None
+
+    def get_mapping_data_by_date(self, data_date):
+        """[[main_ts_code, mapping_ts_code], ...] data_date 当日有映射的全部主力连续代码"""
+        data_date = _convert_to_date(data_date)
+        result = []
+        for main_ts_code, segment in self.main_code_segment_dict.items():
+            ts_code = segment.get_ts_code(data_date)
+            if ts_code is not None:
+                result.append([main_ts_code, ts_code])
+        return result
+
+    def get_main_ts_code_list_by_ts_code(self, ts_code):
+        """映射到 ts_code 的全部主力连续代码, 代码短的在前"""
+        return sorted(self.ts_code_main_code_dict.get(ts_code, set()), key=lambda x: (len(x), x))
+
+    def get_main_ts_code_by_ts_code(self, ts_code):
+        main_ts_code_list = self.get_main_ts_code_list_by_ts_code(ts_code)
+        return main_ts_code_list[0] if main_ts_code_list else None
+
+    def get_shortest_main_ts_code(self, code):
+        """code 本身(如果是主力连续代码)及映射到 code 的主力连续代码中最短的一个, 与按 length(ts_code) 排序取第一个一致"""
+        main_ts_code_list = self._get_related_main_ts_code_list(code)
+        return min(main_ts_code_list, key=lambda x: (len(x), x)) if main_ts_code_list else None
+
+    def _get_related_main_ts_code_list(self, main_ts_code):
+        """main_ts_code 本身(如果是主力连续代码)以及映射到它的主力连续代码"""
+        main_ts_code_set = set(self.ts_code_main_code_dict.get(main_ts_code, set()))
+        if main_ts_code in self.main_code_segment_dict:
+            main_ts_code_set.add(main_ts_code)
+        return sorted(main_ts_code_set)
+
+    def get_ts_code_by_main_ts_code_with_date(self, main_ts_code, start_date, end_date):
+        """[[trade_date, mapping_ts_code], ...], 按 trade_date 排序"""
+        start_date, end_date = _convert_to_date(start_date), _convert_to_date(end_date)
+        result = []
+        for main_ts_code_now in self._get_related_main_ts_code_list(main_ts_code):
+            result.extend(self.main_code_segment_dict[main_ts_code_now].get_interval_data(start_date, end_date))
+        result.sort(key=lambda x: x[0])
+        return result
+
+    def get_contract_change_date_list(self, main_ts_code, start_date, end_date):
+        """区间内主力合约换约的日期"""
+        start_date, end_date = _convert_to_date(start_date), _convert_to_date(end_date)
+        main_ts_code_list = self._get_related_main_ts_code_list(main_ts_code)
+        if len(main_ts_code_list) == 1:
+            return self.main_code_segment_dict[main_ts_code_list[0]].get_change_date_list(start_date, end_date)
+
+        # 对应多个主力连续代码时, 按合并后的映射逐日比较
+        date_list = []
+        previous_mapping_ts_code = None
+        for trade_date, mapping_ts_code in self.get_ts_code_by_main_ts_code_with_date(main_ts_code, start_date, end_date):
+            if mapping_ts_code != previous_mapping_ts_code:
+                date_list.append(trade_date)
+                previous_mapping_ts_code = mapping_ts_code
+        return date_list[1:]
+
+
+rollover_index = RolloverIndex()
@@ -0,0 +1,91 @@
+import asyncio
+import bisect
+import datetime
+
+from source.util.util_base.db import get_single_column, register_statement
+
+GET_TRADE_DATE_SQL = register_statement("trade_calendar.get_trade_date", """
+select date from sec_date_info where is_workday_flag=true order by date
+""")
+
+
+def _convert_to_date(date):
+    if isinstance(date, datetime.datetime):
+        return date.date()
+    return date
+
+
+class TradeCalendar:
+    """
+    进程内交易日历, 首次使用时从 sec_date_info 加载全部交易日, 自然日变化或调用 invalidate 后重新加载
+    查询均在升序的交易日列表上二分查找, 不访问数据库
+    """
+
+    def __init__(self):
+        self.trade_date_list = []
+        self.load_date = None
+        # 首次刷新时创建, 同一时间只有一个请求重新加载
+        self.lock = None
+
+    async def refresh(self, db_conn, force=False):
+        if not force and self.load_date == datetime.date.today():
+            return
+
+        if self.lock is None:
+            self.lock = asyncio.Lock()
+        async with self.lock:
+            # 等待期间其他请求可能已经完成加载
+            today = datetime.date.today()
+            if not force and self.load_date == today:
+                return
+
+            sql = GET_TRADE_DATE_SQL
+            trade_date_list = await get_single_column(db_conn, sql)
+            self.trade_date_list = [_convert_to_date(i) for i in trade_date_list]
+            self.load_date = today
+
+    def invalidate(self):
+        """数据入库后调用, 下次使用时重新加载"""
+        self.load_date = None
+
+    def get_active_trade_day(self, data_date):
+        """小于等于 data_date 的最近交易日"""
+        index = bisect.bisect_right(self.trade_date_list, _convert_to_date(data_date))
+        return self.trade_date_list[index - 1] if index > 0 else None
+
+    def get_previous_trade_day(self, data_date):
+        """小于 data_date 的最近交易日"""
+        index = bisect.bisect_left(self.trade_date_list, _convert_to_date(data_date))
+        return self.trade_date_list[index - 1] if index > 0 else None
+
+    def get_next_trade_day(self, data_date):
+        """大于 data_date 的最近交易日"""
+        index = bisect.bisect_right(self.trade_date_list, _convert_to_date(data_date))
+        return self.trade_date_list[index] if index < len(self.trade_date_list) else None
+
+    def _get_trade_day_index_range(self, start_date, end_date):
+        start_index = bisect.bisect_left(self.trade_date_list, _convert_to_date(start_date))
+        end_index = bisect.bisect_right(self.trade_date_list, _convert_to_date(end_date))
+        return start_index, max(start_index, end_index)
+
+    def get_trade_day_list(self, start_date, end_date):
+        """[start_date, end_date] 之间的交易日"""
+        start_index, end_index = self._get_trade_day_index_range(start_date, end_date)
+        return self.trade_date_list[start_index:end_index]
+
+    def get_trade_day_count(self, start_date, end_date):
+        """[start_date, end_date] 之间的交易日数量"""
+        start_index, end_index = self._get_trade_day_index_range(start_date, end_date)
+        return end_index - start_index
+
+    def shift_trade_day(self, data_date, number):
+        """
+        从 data_date 所在(非交易日取之前最近的)交易日起偏移 number 个交易日, 超出日历范围时返回 None
+        """
+        index = bisect.bisect_right(self.trade_date_list, _convert_to_date(data_date)) - 1 + number
+        if index < 0 or index >= len(self.trade_date_list):
+            return None
+        return self.trade_date_list[index]
+
+
+trade_calendar = TradeCalendar()
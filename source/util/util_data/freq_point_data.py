@@ -0,0 +1,89 @@
+"""
+预先聚合的周/月线数据, 建表语句见 migration/001_create_future_freq_point_data.sql
+"""
+import datetime
+
+from source.util.util_base.db import get_multi_data, register_statement, update_data, update_many_data
+
+GET_LAST_PERIOD_SQL = register_statement("freq_point_data.get_last_period", """
+    select period_start_date, trade_date from future_freq_point_data
+    where ts_code = $1 and data_type = $2 and freq_code = $3
+    order by period_end_date desc limit 1
+    """)
+
+GET_FREQ_POINT_DATA_SQL = register_statement("freq_point_data.get_freq_point_data", """
+    select trade_date, mapping_ts_code, open, high, low, close, vol from future_freq_point_data
+    where ts_code = $1 and data_type = $2 and freq_code = $3 and period_start_date >= $4 and period_end_date <= $5
+    order by trade_date
+    """)
+
+DELETE_FREQ_POINT_DATA_SQL = register_statement("freq_point_data.delete_freq_point_data", """
+    delete from future_freq_point_data
+    where ts_code = $1 and data_type = $2 and freq_code = $3 and period_start_date >= $4
+    """)
+
+LOCK_FREQ_POINT_DATA_SQL = register_statement("freq_point_data.lock_freq_point_data", """
+    select pg_advisory_xact_lock(hashtext($1))
+    """)
+
+INSERT_FREQ_POINT_DATA_SQL = register_statement("freq_point_data.insert_freq_point_data", """
+    insert into future_freq_point_data(ts_code, data_type, freq_code, period_start_date, period_end_date, trade_date, mapping_ts_code, open, high, low, close, vol, update_date)
+    values ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+    on conflict (ts_code, data_type, freq_code, period_end_date) do update set
+    period_start_date = excluded.period_start_date, trade_date = excluded.trade_date, mapping_ts_code = excluded.mapping_ts_code, open = excluded.open,
+    high = excluded.high, low = excluded.low, close = excluded.close, vol = excluded.vol, update_date = excluded.update_date
+    """)
+
+
+class FreqPointData:
+    def __init__(self, db_conn):
+        self.db_conn = db_conn
+
+    async def get_last_period(self, ts_code, data_type, freq_code):
+        """
+        :return: [period_start_date, trade_date], 没有数据时返回 []
+        """
+        sql = GET_LAST_PERIOD_SQL
+        args = [ts_code, data_type.value, freq_code.value]
+        result = await get_multi_data(self.db_conn, sql, args)
+        return result[0] if result else []
+
+    async def lock(self, ts_code, data_type, freq_code):
+        """事务级 advisory lock, 同一代码的刷新在多个进程间串行, 需要在事务中调用, 事务结束时释放"""
+        sql = LOCK_FREQ_POINT_DATA_SQL
+        args = ["{0}|{1}|{2}".format(ts_code, data_type.value, freq_code.value)]
+        await get_multi_data(self.db_conn, sql, args)
+
+    async def get_freq_point_data(self, ts_code, data_type, freq_code, start_date, end_date):
+        """
+        周期开始日期不早于 start_date, 结束日期不晚于 end_date 的数据
+        :return: {trade_date: {ts_code, open, high, low, close, vol}}
+        """
+        sql = GET_FREQ_POINT_DATA_SQL
+        args = [ts_code, data_type.value, freq_code.value, start_date, end_date]
+        result_ori = await get_multi_data(self.db_conn, sql, args)
+
+        result = {}
+        for trade_date, mapping_ts_code, open_price, high, low, close, vol in result_ori:
+            result[trade_date] = {
+                "ts_code": mapping_ts_code,
+                "open": open_price,
+                "high": high,
+                "low": low,
+                "close": close,
+                "vol": vol
+            }
+
+        return result
+
+    async def replace_freq_point_data(self, ts_code, data_type, freq_code, start_date, freq_point_data_list):
+        """
+        删除周期开始日期不早于 start_date 的数据并写入新数据
+        :param freq_point_data_list: [[period_start_date, period_end_date, trade_date, mapping_ts_code, open, high, low, close, vol], ...]
+        """
+        update_date = datetime.datetime.now()
+        async with self.db_conn.transaction():
+            await update_data(self.db_conn, DELETE_FREQ_POINT_DATA_SQL, [ts_code, data_type.value, freq_code.value, start_date])
+            if freq_point_data_list:
+                args_list = [[ts_code, data_type.value, freq_code.value] + row + [update_date] for row in freq_point_data_list]
+                await update_many_data(self.db_conn, INSERT_FREQ_POINT_DATA_SQL, args_list)
@@ -1,33 +1,70 @@
 import datetime
 import json
 
-from source.util.util_base.db import (get_multi_data, get_single_value,
-                                      update_data)
+from source.util.util_base.db import (copy_records, get_multi_data, get_single_value,
+                                      register_statement, update_data)
+from source.util.util_cache.instrument_info import instrument_info
 from source.util.util_data.basic_info import BasicInfo
 
+# 批量写入(COPY)的列, 与单条写入的 insert 列顺序一致
+NOTE_COLUMN_LIST = ["main_ts_code", "ts_code", "freq_code", "trade_date", "note", "update_date"]
+BS_NOTE_COLUMN_LIST = ["main_ts_code", "ts_code", "freq_code", "trade_date", "trade_type", "number", "point", "note", "update_date"]
+
+NOTE_INSERT_SQL = register_statement("note_data.note_insert", """
+    insert into future_note_data(main_ts_code, ts_code, freq_code, trade_date, note, update_date) values ($1, $2, $3, $4, $5, $6)
+    """)
+
+GET_NOTE_SQL = register_statement("note_data.get_note", """
+    select main_ts_code, ts_code, freq_code, trade_date, note from
+    (select main_ts_code, ts_code, freq_code, trade_date, note from future_note_data 
+    where main_ts_code = $1 and trade_date between $2 and $3 
+    union
+    select main_ts_code, ts_code, freq_code, trade_date, note from future_note_data 
+    where main_ts_code = 'common' and trade_date between $2 and $3) a
+    order by trade_date, ts_code, freq_code
+    """)
+
+BS_NOTE_INSERT_SQL = register_statement("note_data.bs_note_insert", """
+    insert into future_bs_note_data(main_ts_code, ts_code, freq_code, trade_date, trade_type, number, point, note, update_date) values ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+    """)
+
+GET_BS_NOTE_SQL = register_statement("note_data.get_bs_note", """
+    select main_ts_code, ts_code, freq_code, trade_date, trade_type, number, point, note from future_bs_note_data 
+    where main_ts_code = $1 and trade_date between $2 and $3 order by trade_date, ts_code, freq_code
+    """)
+
+GET_JSON_DATA_SQL = register_statement("note_data.get_json_data", """
+    select data::json from json_data
+    where name = $1
+    """)
+
+GET_STRATEGY_RESULT_DATA_SQL = register_statement("note_data.get_strategy_result_data", """
+    select ts_code, main_ts_code, strategy_code, freq_code, bs_flag from strategy_result
+    where date=$1 order by strategy_code, ts_code, main_ts_code, freq_code, bs_flag
+    """)
+
 
 class NoteData:
     def __init__(self, db_conn):
         self.db_conn = db_conn
 
     async def note_insert(self, main_ts_code, ts_code, freq_code, trade_date, note):
-        sql = """
-        insert into future_note_data(main_ts_code, ts_code, freq_code, trade_date, note, update_date) values ($1, $2, $3, $4, $5, $6)
-        """
+        sql = NOTE_INSERT_SQL
         args = [main_ts_code, ts_code, freq_code.value, trade_date, note, datetime.datetime.now()]
 
         await update_data(self.db_conn, sql, args)
 
-    async def get_note(self, main_ts_code, start_date, end_date):
-        sql = """
-        select main_ts_code, ts_code, freq_code, trade_date, note from
-        (select main_ts_code, ts_code, freq_code, trade_date, note from future_note_data 
-        where main_ts_code = $1 and trade_date between $2 and $3 
-        union
-        select main_ts_code, ts_code, freq_code, trade_date, note from future_note_data 
-        where main_ts_code = 'common' and trade_date between $2 and $3) a
-        order by trade_date, ts_code, freq_code
+    async def note_insert_batch(self, note_list):
         """
+        :param note_list: [(main_ts_code, ts_code, freq_code, trade_date, note), ...]
+        """
+        update_date = datetime.datetime.now()
+        record_list = [(main_ts_code, ts_code, freq_code.value, trade_date, note, update_date) for main_ts_code, ts_code, freq_code, trade_date, note in note_list]
+
+        await copy_records(self.db_conn, "future_note_data", NOTE_COLUMN_LIST, record_list)
+
+    async def get_note(self, main_ts_code, start_date, end_date):
+        sql = GET_NOTE_SQL
         args = [main_ts_code, start_date, end_date]
         result_ori = await get_multi_data(self.db_conn, sql, args)
         result = []
@@ -43,18 +80,23 @@ class NoteData:
         return result
 
     async def bs_note_insert(self, main_ts_code, ts_code, freq_code, trade_date, trade_type, number, point, note):
-        sql = """
-        insert into future_bs_note_data(main_ts_code, ts_code, freq_code, trade_date, trade_type, number, point, note, update_date) values ($1, $2, $3, $4, $5, $6, $7, $8, $9)
-        """
+        sql = BS_NOTE_INSERT_SQL
         args = [main_ts_code, ts_code, freq_code.value, trade_date, trade_type, number, point, note, datetime.datetime.now()]
 
         await update_data(self.db_conn, sql, args)
 
-    async def get_bs_note(self, main_ts_code, start_date, end_date):
-        sql = """
-        select main_ts_code, ts_code, freq_code, trade_date, trade_type, number, point, note from future_bs_note_data 
-        where main_ts_code = $1 and trade_date between $2 and $3 order by trade_date, ts_code, freq_code
+    async def bs_note_insert_batch(self, bs_note_list):
+        """
+        :param bs_note_list: [(main_ts_code, ts_code, freq_code, trade_date, trade_type, number, point, note), ...]
         """
+        update_date = datetime.datetime.now()
+        record_list = [(main_ts_code, ts_code, freq_code.value, trade_date, trade_type, number, point, note, update_date)
+                       for main_ts_code, ts_code, freq_code, trade_date, trade_type, number, point, note in bs_note_list]
+
+        await copy_records(self.db_conn, "future_bs_note_data", BS_NOTE_COLUMN_LIST, record_list)
+
+    async def get_bs_note(self, main_ts_code, start_date, end_date):
+        sql = GET_BS_NOTE_SQL
         args = [main_ts_code, start_date, end_date]
         result_ori = await get_multi_data(self.db_conn, sql, args)
         result = []
@@ -73,32 +115,23 @@ class NoteData:
         return result
 
     async def get_json_data(self, key_name):
-        sql = """
-        select data::json from json_data
-        where name = $1
-        """
+        sql = GET_JSON_DATA_SQL
         args = [key_name]
         result = await get_single_value(self.db_conn, sql, args)
         result = json.loads(result)
         return result
 
     async def get_strategy_result_data(self, trade_date):
-        sql = """
-        select a.ts_code, a.main_ts_code, b.name, a.strategy_code, a.freq_code, a.bs_flag from strategy_result a left join
-        (select ts_code, name from s_info 
-         union
-         select ts_code, name from future_basic_info_data) b
-         on a.ts_code = b.ts_code
-        where a.date=$1 order by a.strategy_code, a.ts_code, a.main_ts_code, a.freq_code, a.bs_flag
-        """
+        sql = GET_STRATEGY_RESULT_DATA_SQL
         args = [trade_date]
         result_ori = await get_multi_data(self.db_conn, sql, args)
+        await instrument_info.refresh(self.db_conn)
         result = {}
-        for ts_code, main_ts_code, name, strategy_code, freq_code, bs_flag in result_ori:
+        for ts_code, main_ts_code, strategy_code, freq_code, bs_flag in result_ori:
             result.setdefault(strategy_code, []).append({
                 "ts_code": ts_code,
                 "main_ts_code": main_ts_code,
-                "name": name,
+                "name": instrument_info.get_name(ts_code),
                 "freq_code": freq_code,
                 "bs_flag": bs_flag
             })
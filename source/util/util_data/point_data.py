@@ -1,21 +1,130 @@
 import datetime
 
+import numpy as np
 from fastapi import HTTPException, status
 
-from source.util.util_base.db import get_multi_data, get_single_value, get_single_row
+from source.util.util_base.db import get_columnar_data, get_multi_data, get_single_value, get_single_row, iter_multi_data, register_statement
+
+# 列模式下各列的类型, 与 sql 中 select 的列顺序一致
+TOTAL_HOLDING_COLUMN_DTYPE = (
+    ("ts_code", object), ("trade_date", "datetime64[D]"), ("vol", float), ("amount", float), ("oi", float)
+)
+POINT_COLUMN_DTYPE = (
+    ("ts_code", object), ("trade_date", "datetime64[D]"), ("open", float), ("high", float), ("low", float), ("close", float),
+    ("settle", float), ("change1", float), ("change2", float), ("vol", float), ("amount", float)
+)
+BULK_POINT_COLUMN_DTYPE = (("code", object),) + POINT_COLUMN_DTYPE
+
+
+def _group_columnar_data_by_code(columnar_data):
+    """按已排序的 code 列拆分列模式数据, {code: {列名: np.ndarray}}"""
+    code_array = columnar_data["code"]
+    if len(code_array) == 0:
+        return {}
+
+    boundary_index = (np.flatnonzero(code_array[1:] != code_array[:-1]) + 1).tolist()
+    result = {}
+    for start_index, end_index in zip([0] + boundary_index, boundary_index + [len(code_array)]):
+        result[code_array[start_index]] = {
+            column_name: column_value[start_index:end_index] for column_name, column_value in columnar_data.items() if column_name != "code"
+        }
+    return result
+
+
+def _group_point_data_by_code(result_ori):
+    """{code: {trade_date: {...}}}"""
+    result = {}
+    for code, ts_code, trade_date, open_price, high, low, close, settle, change1, change2, vol, amount in result_ori:
+        result.setdefault(code, {})[trade_date] = {
+            "ts_code": ts_code,
+            "open": open_price,
+            "high": high,
+            "low": low,
+            "close": close,
+            "settle": settle,
+            "change1": change1,
+            "change2": change2,
+            "vol": vol,
+            "amount": amount
+        }
+    return result
+
+
+GET_TS_CODE_INTERVAL_TOTAL_HOLDING_DATA_SQL = register_statement("point_data.get_ts_code_interval_total_holding_data", '''
+    select ts_code, trade_date, vol, amount, oi from future_daily_point_data where 
+    ts_code = $1 and trade_date >= $2 and trade_date <= $3
+    order by trade_date
+    ''')
+
+GET_TS_CODE_INTERVAL_HOLDING_DATA_SQL = register_statement("point_data.get_ts_code_interval_holding_data", '''
+    select trade_date, broker, vol, vol_chg, long_hld, long_chg, short_hld, short_chg from future_holding_data 
+    where symbol = $1 and trade_date >= $2 and trade_date <= $3
+    order by trade_date
+    ''')
+
+GET_FUTURE_INTERVAL_POINT_DATA_SQL = register_statement("point_data.get_future_interval_point_data", '''
+    select ts_code, trade_date, open, high, low, close, settle, change1, change2, vol, amount from future_daily_point_data where 
+    ts_code = $1 and trade_date >= $2 and trade_date <= $3
+    order by trade_date
+    ''')
+
+GET_FUTURE_INTERVAL_POINT_DATA_BY_MAIN_CODE_SQL = register_statement("point_data.get_future_interval_point_data_by_main_code", """select a.ts_code, a.trade_date, a.open, a.high, a.low, a.close, a.settle, a.change1, a.change2, a.vol, a.amount from 
+    future_daily_point_data a inner join
+        (select trade_date, mapping_ts_code from future_main_code_data where ts_code=(
+        select ts_code from future_main_code_data where mapping_ts_code= $1 or ts_code=$1 order by length(ts_code) limit 1)) b 
+    on a.ts_code=b.mapping_ts_code and a.trade_date=b.trade_date
+    where a.trade_date >= $2 and a.trade_date <= $3
+    order by a.trade_date""")
+
+GET_FUTURE_INTERVAL_POINT_DATA_BULK_SQL = register_statement("point_data.get_future_interval_point_data_bulk", '''
+    select ts_code as code, ts_code, trade_date, open, high, low, close, settle, change1, change2, vol, amount from future_daily_point_data where 
+    ts_code = ANY($1::text[]) and trade_date >= $2 and trade_date <= $3
+    order by ts_code, trade_date
+    ''')
+
+GET_FUTURE_INTERVAL_POINT_DATA_BY_MAIN_CODE_BULK_SQL = register_statement("point_data.get_future_interval_point_data_by_main_code_bulk", """select c.code, a.ts_code, a.trade_date, a.open, a.high, a.low, a.close, a.settle, a.change1, a.change2, a.vol, a.amount from 
+    (select distinct on (q.code) q.code, m.ts_code as main_ts_code from 
+        unnest($1::text[]) q(code) inner join future_main_code_data m on m.mapping_ts_code = q.code or m.ts_code = q.code
+        order by q.code, length(m.ts_code)) c
+    inner join future_main_code_data b on b.ts_code = c.main_ts_code
+    inner join future_daily_point_data a on a.ts_code = b.mapping_ts_code and a.trade_date = b.trade_date
+    where a.trade_date >= $2 and a.trade_date <= $3
+    order by c.code, a.trade_date""")
+
+GET_FUTURE_NOW_POINT_BY_MAIN_CODE_SQL = register_statement("point_data.get_future_now_point_by_main_code", """
+    select a.close from 
+        future_daily_point_data a inner join
+            (select trade_date, mapping_ts_code from future_main_code_data where ts_code=(
+            select ts_code from future_main_code_data where mapping_ts_code=$1 order by length(ts_code) limit 1)) b 
+        on a.ts_code=b.mapping_ts_code and a.trade_date=b.trade_date
+        where a.trade_date >= $2 and a.trade_date <= $3
+        order by a.trade_date desc
+        limit 1
+    """)
+
+GET_FUTURE_MAX_MIN_POINT_BY_MAIN_CODE_SQL = register_statement("point_data.get_future_max_min_point_by_main_code", """
+    select max(a.close), min(a.close) from 
+               future_daily_point_data a inner join
+                   (select trade_date, mapping_ts_code from future_main_code_data where ts_code=(
+                   select ts_code from future_main_code_data where mapping_ts_code=$1 order by length(ts_code) limit 1)) b 
+               on a.ts_code=b.mapping_ts_code and a.trade_date=b.trade_date
+               where a.trade_date >= $2 and a.trade_date <= $3
+    """)
 
 
 class PointData:
     def __init__(self, db_conn):
         self.db_conn = db_conn
 
-    async def get_ts_code_interval_total_holding_data(self, ts_code, start_date, end_date):
-        sql = '''
-        select ts_code, trade_date, vol, amount, oi from future_daily_point_data where 
-        ts_code = $1 and trade_date >= $2 and trade_date <= $3
-        order by trade_date
-        '''
+    async def get_ts_code_interval_total_holding_data(self, ts_code, start_date, end_date, columnar=False):
+        """
+        :param columnar: True 时返回 {列名: np.ndarray}, trade_date 列为日期索引
+        """
+        sql = GET_TS_CODE_INTERVAL_TOTAL_HOLDING_DATA_SQL
         args = [ts_code, start_date, end_date]
+        if columnar:
+            return await get_columnar_data(self.db_conn, sql, args, TOTAL_HOLDING_COLUMN_DTYPE)
+
         result_ori = await get_multi_data(self.db_conn, sql, args)
 
         result = {}
@@ -30,11 +139,7 @@ class PointData:
         return result
 
     async def get_ts_code_interval_holding_data(self, ts_code, start_date, end_date):
-        sql = '''
-        select trade_date, broker, vol, vol_chg, long_hld, long_chg, short_hld, short_chg from future_holding_data 
-        where symbol = $1 and trade_date >= $2 and trade_date <= $3
-        order by trade_date
-        '''
+        sql = GET_TS_CODE_INTERVAL_HOLDING_DATA_SQL
         args = [ts_code.split(".")[0], start_date, end_date]
         result_ori = await get_multi_data(self.db_conn, sql, args)
 
@@ -52,13 +157,15 @@ class PointData:
 
         return result
 
-    async def get_future_interval_point_data(self, ts_code, start_date, end_date):
-        sql = '''
-        select ts_code, trade_date, open, high, low, close, settle, change1, change2, vol, amount from future_daily_point_data where 
-        ts_code = $1 and trade_date >= $2 and trade_date <= $3
-        order by trade_date
-        '''
+    async def get_future_interval_point_data(self, ts_code, start_date, end_date, columnar=False):
+        """
+        :param columnar: True 时返回 {列名: np.ndarray}, trade_date 列为日期索引
+        """
+        sql = GET_FUTURE_INTERVAL_POINT_DATA_SQL
         args = [ts_code, start_date, end_date]
+        if columnar:
+            return await get_columnar_data(self.db_conn, sql, args, POINT_COLUMN_DTYPE)
+
         result_ori = await get_multi_data(self.db_conn, sql, args)
 
         result = {}
@@ -78,16 +185,16 @@ class PointData:
 
         return result
 
-    async def get_future_interval_point_data_by_main_code(self, ts_code, start_date, end_date):
-        sql = """select a.ts_code, a.trade_date, a.open, a.high, a.low, a.close, a.settle, a.change1, a.change2, a.vol, a.amount from 
-        future_daily_point_data a inner join
-            (select trade_date, mapping_ts_code from future_main_code_data where ts_code=(
-            select ts_code from future_main_code_data where mapping_ts_code= $1 or ts_code=$1 order by length(ts_code) limit 1)) b 
-        on a.ts_code=b.mapping_ts_code and a.trade_date=b.trade_date
-        where a.trade_date >= $2 and a.trade_date <= $3
-        order by a.trade_date"""
+    async def get_future_interval_point_data_by_main_code(self, ts_code, start_date, end_date, columnar=False):
+        """
+        :param columnar: True 时返回 {列名: np.ndarray}, trade_date 列为日期索引
+        """
+        sql = GET_FUTURE_INTERVAL_POINT_DATA_BY_MAIN_CODE_SQL
 
         args = [ts_code, start_date, end_date]
+        if columnar:
+            return await get_columnar_data(self.db_conn, sql, args, POINT_COLUMN_DTYPE)
+
         result_ori = await get_multi_data(self.db_conn, sql, args)
 
         result = {}
@@ -107,18 +214,57 @@ class PointData:
 
         return result
 
+    async def iter_future_interval_point_data(self, ts_code, start_date, end_date):
+        """
+        服务端游标逐行读取, 与 get_future_interval_point_data 的数据相同
+        :return: 异步迭代 [ts_code, trade_date, open, high, low, close, settle, change1, change2, vol, amount]
+        """
+        args = [ts_code, start_date, end_date]
+        async for row in iter_multi_data(self.db_conn, GET_FUTURE_INTERVAL_POINT_DATA_SQL, args):
+            yield row
+
+    async def iter_future_interval_point_data_by_main_code(self, ts_code, start_date, end_date):
+        """
+        服务端游标逐行读取, 与 get_future_interval_point_data_by_main_code 的数据相同
+        :return: 异步迭代 [ts_code, trade_date, open, high, low, close, settle, change1, change2, vol, amount]
+        """
+        args = [ts_code, start_date, end_date]
+        async for row in iter_multi_data(self.db_conn, GET_FUTURE_INTERVAL_POINT_DATA_BY_MAIN_CODE_SQL, args):
+            yield row
+
+    async def get_future_interval_point_data_bulk(self, ts_code_list, start_date, end_date, columnar=False):
+        """
+        一次查询多个 ts_code 的日线数据
+        :param columnar: True 时每个 ts_code 的数据为 {列名: np.ndarray}
+        :return: {ts_code: {trade_date: {...}}}, 未取到数据的 ts_code 不返回
+        """
+        sql = GET_FUTURE_INTERVAL_POINT_DATA_BULK_SQL
+        args = [list(ts_code_list), start_date, end_date]
+        if columnar:
+            result = await get_columnar_data(self.db_conn, sql, args, BULK_POINT_COLUMN_DTYPE)
+            return _group_columnar_data_by_code(result)
+
+        result_ori = await get_multi_data(self.db_conn, sql, args)
+        return _group_point_data_by_code(result_ori)
+
+    async def get_future_interval_point_data_by_main_code_bulk(self, ts_code_list, start_date, end_date, columnar=False):
+        """
+        一次查询多个代码的主力连续日线数据, 代码对应主力连续的规则同 get_future_interval_point_data_by_main_code
+        :param columnar: True 时每个代码的数据为 {列名: np.ndarray}
+        :return: {传入的代码: {trade_date: {...}}}, 未取到数据的代码不返回
+        """
+        sql = GET_FUTURE_INTERVAL_POINT_DATA_BY_MAIN_CODE_BULK_SQL
+        args = [list(ts_code_list), start_date, end_date]
+        if columnar:
+            result = await get_columnar_data(self.db_conn, sql, args, BULK_POINT_COLUMN_DTYPE)
+            return _group_columnar_data_by_code(result)
+
+        result_ori = await get_multi_data(self.db_conn, sql, args)
+        return _group_point_data_by_code(result_ori)
+
     async def get_future_now_point_by_main_code(self, ts_code, data_date):
         start_date = data_date - datetime.timedelta(days=30)
-        sql = """
-        select a.close from 
-            future_daily_point_data a inner join
-                (select trade_date, mapping_ts_code from future_main_code_data where ts_code=(
-                select ts_code from future_main_code_data where mapping_ts_code=$1 order by length(ts_code) limit 1)) b 
-            on a.ts_code=b.mapping_ts_code and a.trade_date=b.trade_date
-            where a.trade_date >= $2 and a.trade_date <= $3
-            order by a.trade_date desc
-            limit 1
-        """
+        sql = GET_FUTURE_NOW_POINT_BY_MAIN_CODE_SQL
         args = [ts_code, start_date, data_date]
         point_now = await get_single_value(self.db_conn, sql, args)
         if not point_now:
@@ -129,14 +275,7 @@ class PointData:
         return point_now
 
     async def get_future_max_min_point_by_main_code(self, ts_code, start_date, end_date):
-        sql = """
-        select max(a.close), min(a.close) from 
-                   future_daily_point_data a inner join
-                       (select trade_date, mapping_ts_code from future_main_code_data where ts_code=(
-                       select ts_code from future_main_code_data where mapping_ts_code=$1 order by length(ts_code) limit 1)) b 
-                   on a.ts_code=b.mapping_ts_code and a.trade_date=b.trade_date
-                   where a.trade_date >= $2 and a.trade_date <= $3
-        """
+        sql = GET_FUTURE_MAX_MIN_POINT_BY_MAIN_CODE_SQL
         args = [ts_code, start_date, end_date]
         result = await get_single_row(self.db_conn, sql, args)
         if not result:
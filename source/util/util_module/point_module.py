@@ -1,57 +1,216 @@
-from source.util.util_base.date_util import get_interval_date_list_by_freq_code, adjust_interval_date_list_by_exists_date, adjust_interval_all_date_list_by_exists_date
+import asyncio
+import bisect
+import datetime
+import heapq
+import math
+
+import asyncpg
+import numpy as np
+from fastapi.logger import logger
+
+from source.util.util_base.constant import FreqCode, PointDataType
+from source.util.util_base.date_util import convert_datetime_to_str, get_end_date_by_freq_code, get_interval_date_list_by_freq_code
+from source.util.util_base.resample_util import resample_ohlcv
+from source.util.util_cache.close_point_index import close_point_index
+from source.util.util_data.freq_point_data import FreqPointData
 from source.util.util_data.point_data import PointData
 
+# 周/月线存储的起始日期, 2000-01-01 为周六且为月初, 周与月的周期都从该日开始
+FREQ_POINT_STORE_START_DATE = datetime.date(2000, 1, 1)
+# {(ts_code, data_type, freq_code): asyncio.Lock}, 同一代码的存储刷新在进程内串行
+_freq_point_refresh_lock_dict = {}
+# 点位百分位使用的历史区间天数, 以及当前点位向前查找的最大天数
+POINT_PERCENT_DAY_NUMBER = 3650
+POINT_NOW_DAY_NUMBER = 30
+
+
+def _resample_interval_point_data(interval_point_data, interval_date_list):
+    """
+    列模式的日线数据按 interval_date_list 聚合, 开盘价或收盘价为空的周期不返回
+    :param interval_point_data: {列名: np.ndarray}
+    """
+    resample_data = resample_ohlcv(
+        interval_point_data["trade_date"], interval_point_data["open"], interval_point_data["high"], interval_point_data["low"],
+        interval_point_data["close"], interval_point_data["vol"], np.array([i[-1] for i in interval_date_list], dtype="datetime64[D]")
+    )
 
-def _get_high_low_point(interval_point_data):
-    high_point_list = [i['high'] for i in interval_point_data if i['high'] is not None]
-    high = max(high_point_list) if high_point_list else None
+    ts_code_array = interval_point_data["ts_code"][resample_data["end_index"]]
+    interval_point_data_by_freq_code = {}
+    for date, ts_code, open_price, high, low, close, vol in zip(resample_data["date"].tolist(), ts_code_array.tolist(), resample_data["open"].tolist(),
+                                                                 resample_data["high"].tolist(), resample_data["low"].tolist(), resample_data["close"].tolist(),
+                                                                 resample_data["vol"].tolist()):
+        interval_point_data_by_freq_code[date] = {
+            "ts_code": ts_code,
+            "open": open_price,
+            "high": None if math.isnan(high) else high,
+            "low": None if math.isnan(low) else low,
+            "close": close,
+            "vol": None if math.isnan(vol) else vol
+        }
+    return interval_point_data_by_freq_code
 
-    low_point_list = [i['low'] for i in interval_point_data if i['low'] is not None]
-    low = min(low_point_list) if low_point_list else None
 
-    return high, low
+async def _get_daily_columnar_data(db_conn, ts_code, data_type, start_date, end_date):
+    if data_type is PointDataType.MAIN:
+        return await PointData(db_conn).get_future_interval_point_data_by_main_code(ts_code, start_date, end_date, columnar=True)
+    return await PointData(db_conn).get_future_interval_point_data(ts_code, start_date, end_date, columnar=True)
 
 
-async def get_main_code_interval_point_data_by_freq_code(db_conn, ts_code, start_date, end_date, freq_code):
+async def _get_interval_point_data_from_daily(db_conn, ts_code, data_type, start_date, end_date, freq_code):
+    """查询日线数据后实时聚合"""
     interval_date_list = get_interval_date_list_by_freq_code(start_date, end_date, freq_code)
-    interval_point_data = await PointData(db_conn).get_future_interval_point_data_by_main_code(ts_code, interval_date_list[0][0], interval_date_list[-1][-1])
-    interval_date_list = adjust_interval_all_date_list_by_exists_date(interval_date_list, list(interval_point_data))
+    interval_point_data = await _get_daily_columnar_data(db_conn, ts_code, data_type, interval_date_list[0][0], interval_date_list[-1][-1])
+    return _resample_interval_point_data(interval_point_data, interval_date_list)
+
+
+async def refresh_freq_point_data(db_conn, ts_code, data_type, freq_code):
+    """
+    增量刷新周/月线存储, 只重新计算最后一个已存储的周期(可能尚未结束)及之后的周期
+    存储为空时从 FREQ_POINT_STORE_START_DATE 开始全量计算
+    只由 /point/refresh_freq_point_data 调用, 同一代码进程内按锁串行, 进程间按事务级 advisory lock 串行
+    """
+    lock = _freq_point_refresh_lock_dict.setdefault((ts_code, data_type, freq_code), asyncio.Lock())
+    async with lock, db_conn.transaction():
+        freq_point_data = FreqPointData(db_conn)
+        await freq_point_data.lock(ts_code, data_type, freq_code)
+
+        last_period = await freq_point_data.get_last_period(ts_code, data_type, freq_code)
+        refresh_start_date = last_period[0] if last_period else FREQ_POINT_STORE_START_DATE
+        refresh_end_date = get_end_date_by_freq_code(datetime.date.today(), freq_code)
+        if refresh_start_date > refresh_end_date:
+            return
+
+        interval_date_list = get_interval_date_list_by_freq_code(refresh_start_date, refresh_end_date, freq_code)
+        interval_point_data = await _get_daily_columnar_data(db_conn, ts_code, data_type, refresh_start_date, refresh_end_date)
+        interval_point_data_by_freq_code = _resample_interval_point_data(interval_point_data, interval_date_list)
+
+        period_end_date_list = [i[-1] for i in interval_date_list]
+        freq_point_data_list = []
+        for trade_date, date_data in interval_point_data_by_freq_code.items():
+            period_start_date, period_end_date = interval_date_list[bisect.bisect_left(period_end_date_list, trade_date)]
+            freq_point_data_list.append([period_start_date, period_end_date, trade_date, date_data["ts_code"], date_data["open"], date_data["high"],
+                                         date_data["low"], date_data["close"], date_data["vol"]])
+
+        await freq_point_data.replace_freq_point_data(ts_code, data_type, freq_code, refresh_start_date, freq_point_data_list)
+
+
+async def _get_last_stored_period(db_conn, ts_code, data_type, freq_code):
+    """存储中最后一个周期的 [period_start_date, trade_date], 没有数据或表不存在时返回 []"""
+    try:
+        return await FreqPointData(db_conn).get_last_period(ts_code, data_type, freq_code)
+    except asyncpg.UndefinedTableError:
+        logger.warning("future_freq_point_data 不存在, 周/月线使用日线实时聚合, 建表语句见 migration 目录")
+        return []
+
+
+async def _get_interval_point_data_from_store(db_conn, ts_code, data_type, start_date, end_date, freq_code):
+    """
+    周/月线从存储读取, 读取时不刷新存储
+    存储中最后一个周期可能尚未结束或已过期, 该周期及之后的数据使用日线实时聚合, 存储为空或表不存在时全部使用日线实时聚合
+    start_date 不是周期开始日期时, 第一个周期只包含 start_date 之后的数据, 该周期也使用日线实时聚合
+    存储只包含 FREQ_POINT_STORE_START_DATE 之后的周期, 之前的周期使用日线实时聚合
+    """
+    end_date = get_end_date_by_freq_code(end_date, freq_code)
+    last_period = await _get_last_stored_period(db_conn, ts_code, data_type, freq_code)
+    if not last_period:
+        return await _get_interval_point_data_from_daily(db_conn, ts_code, data_type, start_date, end_date, freq_code)
 
     interval_point_data_by_freq_code = {}
-    for date_list in interval_date_list:
-        high, low = _get_high_low_point([interval_point_data[i] for i in date_list])
-        start_date, end_date = date_list[0], date_list[-1]
-        if interval_point_data[start_date]['open'] and interval_point_data[end_date]['close']:
-            interval_point_data_by_freq_code[end_date] = {
-                "ts_code": interval_point_data[end_date]['ts_code'],
-                "open": interval_point_data[start_date]['open'],
-                "high": high,
-                "low": low,
-                "close": interval_point_data[end_date]['close'],
-                "vol": interval_point_data[end_date]['vol']
-            }
+    store_start_date = start_date
+    previous_period_end_date = start_date - datetime.timedelta(days=1)
+    if get_end_date_by_freq_code(previous_period_end_date, freq_code) != previous_period_end_date:
+        first_period_end_date = get_end_date_by_freq_code(start_date, freq_code)
+        interval_point_data_by_freq_code = await _get_interval_point_data_from_daily(db_conn, ts_code, data_type, start_date, first_period_end_date, freq_code)
+        store_start_date = first_period_end_date + datetime.timedelta(days=1)
+
+    if store_start_date < FREQ_POINT_STORE_START_DATE:
+        before_store_end_date = min(end_date, FREQ_POINT_STORE_START_DATE - datetime.timedelta(days=1))
+        if store_start_date <= before_store_end_date:
+            interval_point_data_by_freq_code.update(
+                await _get_interval_point_data_from_daily(db_conn, ts_code, data_type, store_start_date, before_store_end_date, freq_code)
+            )
+        store_start_date = FREQ_POINT_STORE_START_DATE
+
+    daily_start_date = max(store_start_date, last_period[0])
+    store_end_date = min(end_date, daily_start_date - datetime.timedelta(days=1))
+    if store_start_date <= store_end_date:
+        interval_point_data_by_freq_code.update(await FreqPointData(db_conn).get_freq_point_data(ts_code, data_type, freq_code, store_start_date, store_end_date))
+    if daily_start_date <= end_date:
+        interval_point_data_by_freq_code.update(await _get_interval_point_data_from_daily(db_conn, ts_code, data_type, daily_start_date, end_date, freq_code))
     return interval_point_data_by_freq_code
 
 
+async def get_main_code_interval_point_data_by_freq_code(db_conn, ts_code, start_date, end_date, freq_code):
+    if freq_code is FreqCode.DAY:
+        return await _get_interval_point_data_from_daily(db_conn, ts_code, PointDataType.MAIN, start_date, end_date, freq_code)
+    return await _get_interval_point_data_from_store(db_conn, ts_code, PointDataType.MAIN, start_date, end_date, freq_code)
+
+
 async def get_ts_code_interval_point_data_by_freq_code(db_conn, ts_code, start_date, end_date, freq_code):
+    if freq_code is FreqCode.DAY:
+        return await _get_interval_point_data_from_daily(db_conn, ts_code, PointDataType.TS, start_date, end_date, freq_code)
+    return await _get_interval_point_data_from_store(db_conn, ts_code, PointDataType.TS, start_date, end_date, freq_code)
+
+
+async def _iter_interval_point_data(point_data_iter, interval_date_list):
+    """
+    逐行读取按日期升序的日线数据, 每个周期结束时 yield 该周期的数据, 规则与 _resample_interval_point_data 相同
+    :param point_data_iter: 异步迭代 [ts_code, trade_date, open, high, low, close, ...] (vol 为倒数第二列)
+    """
+    period_end_date_list = [i[-1] for i in interval_date_list]
+    period_index, period_data = None, None
+
+    async for row in point_data_iter:
+        ts_code, trade_date, open_price, high, low, close, vol = row[0], row[1], row[2], row[3], row[4], row[5], row[-2]
+        period_index_now = bisect.bisect_left(period_end_date_list, trade_date)
+        if period_index_now >= len(period_end_date_list):
+            continue
+
+        if period_index_now != period_index:
+            if period_data is not None and period_data["open"] and period_data["close"]:
+                yield period_data
+            period_index = period_index_now
+            period_data = {"date": None, "ts_code": None, "open": open_price, "high": None, "low": None, "close": None, "vol": None}
+
+        if high is not None:
+            period_data["high"] = high if period_data["high"] is None else max(period_data["high"], high)
+        if low is not None:
+            period_data["low"] = low if period_data["low"] is None else min(period_data["low"], low)
+        period_data.update({"date": trade_date, "ts_code": ts_code, "close": close, "vol": vol})
+
+    if period_data is not None and period_data["open"] and period_data["close"]:
+        yield period_data
+
+
+async def iter_main_code_interval_point_data_by_freq_code(db_conn, ts_code, start_date, end_date, freq_code):
+    """流式获取主力连续周期数据, 每次 yield 一个周期 {date, ts_code, open, high, low, close, vol}"""
     interval_date_list = get_interval_date_list_by_freq_code(start_date, end_date, freq_code)
-    interval_point_data = await PointData(db_conn).get_future_interval_point_data(ts_code, interval_date_list[0][0], interval_date_list[-1][-1])
-    interval_date_list = adjust_interval_all_date_list_by_exists_date(interval_date_list, list(interval_point_data))
+    point_data_iter = PointData(db_conn).iter_future_interval_point_data_by_main_code(ts_code, interval_date_list[0][0], interval_date_list[-1][-1])
+    async for period_data in _iter_interval_point_data(point_data_iter, interval_date_list):
+        yield period_data
 
-    interval_point_data_by_freq_code = {}
-    for date_list in interval_date_list:
-        high, low = _get_high_low_point([interval_point_data[i] for i in date_list])
-        start_date, end_date = date_list[0], date_list[-1]
-        if interval_point_data[start_date]['open'] and interval_point_data[end_date]['close']:
-            interval_point_data_by_freq_code[end_date] = {
-                "ts_code": interval_point_data[end_date]['ts_code'],
-                "open": interval_point_data[start_date]['open'],
-                "high": high,
-                "low": low,
-                "close": interval_point_data[end_date]['close'],
-                "vol": interval_point_data[end_date]['vol']
-            }
-    return interval_point_data_by_freq_code
+
+async def iter_ts_code_interval_point_data_by_freq_code(db_conn, ts_code, start_date, end_date, freq_code):
+    """流式获取 ts_code 周期数据, 每次 yield 一个周期 {date, ts_code, open, high, low, close, vol}"""
+    interval_date_list = get_interval_date_list_by_freq_code(start_date, end_date, freq_code)
+    point_data_iter = PointData(db_conn).iter_future_interval_point_data(ts_code, interval_date_list[0][0], interval_date_list[-1][-1])
+    async for period_data in _iter_interval_point_data(point_data_iter, interval_date_list):
+        yield period_data
+
+
+async def get_main_code_bulk_interval_point_data_by_freq_code(db_conn, ts_code_list, start_date, end_date, freq_code):
+    """一次查询多个代码的主力连续数据并按周期聚合, {ts_code: {date: {...}}}"""
+    interval_date_list = get_interval_date_list_by_freq_code(start_date, end_date, freq_code)
+    bulk_point_data = await PointData(db_conn).get_future_interval_point_data_by_main_code_bulk(ts_code_list, interval_date_list[0][0], interval_date_list[-1][-1],
+                                                                                               columnar=True)
+    return {ts_code: _resample_interval_point_data(interval_point_data, interval_date_list) for ts_code, interval_point_data in bulk_point_data.items()}
+
+
+async def get_ts_code_bulk_interval_point_data_by_freq_code(db_conn, ts_code_list, start_date, end_date, freq_code):
+    """一次查询多个 ts_code 的数据并按周期聚合, {ts_code: {date: {...}}}"""
+    interval_date_list = get_interval_date_list_by_freq_code(start_date, end_date, freq_code)
+    bulk_point_data = await PointData(db_conn).get_future_interval_point_data_bulk(ts_code_list, interval_date_list[0][0], interval_date_list[-1][-1], columnar=True)
+    return {ts_code: _resample_interval_point_data(interval_point_data, interval_date_list) for ts_code, interval_point_data in bulk_point_data.items()}
 
 
 async def get_ts_code_interval_holding_data(db_conn, ts_code, start_date, end_date):
@@ -98,3 +257,92 @@ async def get_ts_code_interval_pure_holding_data(db_conn, ts_code, start_date, e
                     interval_holding_data[date]["vol"].append({"broker": row["broker"], "amount": row["vol"], "chg": row["vol_chg"]})
 
     return interval_holding_data
+
+
+def _sum_first_n_holding_data(holding_row_list, first_n_list):
+    """
+    按 amount 取前 max(first_n_list) 名(部分排序), 返回 {first_n: (前N名之和, 前N名占比)}
+    """
+    amount_list = [i["amount"] for i in holding_row_list]
+    sum_amount = sum(amount_list)
+
+    first_n_sum_list = [0]
+    for amount in heapq.nlargest(max(first_n_list), amount_list):
+        first_n_sum_list.append(first_n_sum_list[-1] + amount)
+
+    result = {}
+    for first_n in first_n_list:
+        first_n_sum = first_n_sum_list[min(first_n, len(first_n_sum_list) - 1)]
+        result[first_n] = (first_n_sum, first_n_sum / sum_amount if sum_amount else 0)
+    return result
+
+
+async def get_ts_code_interval_pure_holding_first_n_data(db_conn, ts_code, start_date, end_date, first_n_list):
+    """
+    获取净持仓前N名之和及其占比, 每个日期只遍历一次
+    :return: {first_n: [{"date": "2021-04-02", "long": 1, "long_percent": 0.1, "short": 1, "short_percent": 0.1}, ...]}
+    """
+    interval_holding_data = await get_ts_code_interval_pure_holding_data(db_conn, ts_code, start_date, end_date)
+
+    result = {first_n: [] for first_n in first_n_list}
+    for date in sorted(interval_holding_data):
+        date_result = {first_n: {"date": convert_datetime_to_str(date)} for first_n in first_n_list}
+        for key in ("long", "short"):
+            for first_n, (first_n_sum, first_n_percent) in _sum_first_n_holding_data(interval_holding_data[date][key], first_n_list).items():
+                date_result[first_n][key] = first_n_sum
+                date_result[first_n][key + "_percent"] = first_n_percent
+
+        for first_n in first_n_list:
+            result[first_n].append(date_result[first_n])
+
+    return result
+
+
+def _format_point_percent_data(data_date, max_point, min_point, point_now, point_now_date):
+    """当前点位未取到(向前 POINT_NOW_DAY_NUMBER 天内无数据或为空)时 point_now 为 None, 最大最小点位相等时 point_percent 为 None"""
+    if np.isnat(point_now_date) or point_now_date.item() < data_date - datetime.timedelta(days=POINT_NOW_DAY_NUMBER) or np.isnan(point_now) or point_now == 0:
+        point_now = None
+
+    point_percent = None
+    if point_now is not None and max_point > min_point:
+        point_percent = float((point_now - min_point) / (max_point - min_point))
+
+    return {
+        "point_percent": point_percent,
+        "max_point": None if np.isnan(max_point) else float(max_point),
+        "min_point": None if np.isnan(min_point) else float(min_point),
+        "point_now": None if point_now is None else float(point_now)
+    }
+
+
+async def get_main_code_point_percent_data(db_conn, ts_code, data_date_list):
+    """
+    品种点位在历史点位(10年)中的位置, 每个日期的最大最小点位由收盘价索引 O(1) 得到
+    :return: [{"date": date, "point_percent": 0.1, "max_point": 1, "min_point": 1, "point_now": 1}, ...]
+    """
+    start_date_list = [i - datetime.timedelta(days=POINT_PERCENT_DAY_NUMBER) for i in data_date_list]
+    max_point_array, min_point_array, point_now_array, point_now_date_array = await close_point_index.get_max_min_now_point(
+        db_conn, ts_code, start_date_list, data_date_list)
+
+    result = []
+    for index, data_date in enumerate(data_date_list):
+        result.append({"date": data_date})
+        result[-1].update(_format_point_percent_data(data_date, max_point_array[index], min_point_array[index], point_now_array[index], point_now_date_array[index]))
+    return result
+
+
+async def get_main_code_bulk_point_percent_data(db_conn, ts_code_list, data_date):
+    """
+    多个品种在同一日期的历史点位(10年)位置, 未加载的品种合并为一次批量查询
+    :return: [{"ts_code": "A.DCE", "point_percent": 0.1, "max_point": 1, "min_point": 1, "point_now": 1}, ...] 按 point_percent 降序, 为 None 的排在最后
+    """
+    start_date = data_date - datetime.timedelta(days=POINT_PERCENT_DAY_NUMBER)
+    bulk_point_data = await close_point_index.get_bulk_max_min_now_point(db_conn, ts_code_list, start_date, data_date)
+
+    result = []
+    for ts_code in ts_code_list:
+        result.append({"ts_code": ts_code})
+        result[-1].update(_format_point_percent_data(data_date, *bulk_point_data[ts_code]))
+
+    result.sort(key=lambda x: (x["point_percent"] is None, -(x["point_percent"] or 0), x["ts_code"]))
+    return result
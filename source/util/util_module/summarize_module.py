@@ -0,0 +1,89 @@
+import numpy as np
+
+
+# 相对收盘价的基准点位
+RELATIVE_BASE_POINT = 1000
+
+
+def get_close_point_matrix(ts_code_point_data, ts_code_list=None, date_list=None):
+    """
+    将各品种的收盘价对齐为 日期 x 品种 的矩阵, 缺失或为空的位置为 NaN
+    :param ts_code_point_data: {ts_code: {date: {"close": 1, ...}}}
+    :param ts_code_list: 矩阵列的顺序, 默认为 ts_code_point_data 的顺序
+    :param date_list: 矩阵行的日期, 升序, 默认为全部品种日期的并集, 不在其中的日期丢弃
+    :return: (date_list, ts_code_list, close_matrix)
+    """
+    ts_code_list = list(ts_code_point_data) if ts_code_list is None else ts_code_list
+
+    if date_list is None:
+        date_set = set()
+        for ts_code in ts_code_list:
+            date_set.update(ts_code_point_data[ts_code])
+        date_list = sorted(date_set)
+    date_index_dict = {date: index for index, date in enumerate(date_list)}
+
+    close_matrix = np.full((len(date_list), len(ts_code_list)), np.nan)
+    for column_index, ts_code in enumerate(ts_code_list):
+        ts_code_data = {date: date_data for date, date_data in ts_code_point_data[ts_code].items() if date in date_index_dict}
+        if not ts_code_data:
+            continue
+        row_index_array = np.fromiter((date_index_dict[date] for date in ts_code_data), dtype=np.int64, count=len(ts_code_data))
+        close_array = np.array([date_data["close"] for date_data in ts_code_data.values()], dtype=float)
+        close_matrix[row_index_array, column_index] = close_array
+
+    return date_list, ts_code_list, close_matrix
+
+
+def get_raise_fall_data(date_list, close_matrix):
+    """
+    相邻两个日期都有收盘价的品种中, 上涨与下跌(含持平)的数量, 比例以及累计涨跌线(上涨数 - 下跌数 的累计值)
+    :return: [{"date": date, "raise_num": 1, "fall_num": 1, "raise_ratio": 0.5, "fall_ratio": 0.5, "ad_line": 0}, ...] 不含第一个日期
+    """
+    if len(date_list) < 2:
+        return []
+
+    close_now, close_previous = close_matrix[1:], close_matrix[:-1]
+    valid_flag = ~np.isnan(close_now) & ~np.isnan(close_previous)
+    raise_flag = valid_flag & (close_now > close_previous)
+
+    raise_num_array = raise_flag.sum(axis=1)
+    total_num_array = valid_flag.sum(axis=1)
+    fall_num_array = total_num_array - raise_num_array
+    ad_line_array = np.cumsum(raise_num_array - fall_num_array)
+
+    result = []
+    for index, date_now in enumerate(date_list[1:]):
+        raise_num, fall_num, total_num = int(raise_num_array[index]), int(fall_num_array[index]), int(total_num_array[index])
+        result.append({
+            "date": date_now,
+            "raise_num": raise_num,
+            "fall_num": fall_num,
+            "raise_ratio": raise_num / total_num if total_num else None,
+            "fall_ratio": fall_num / total_num if total_num else None,
+            "ad_line": int(ad_line_array[index])
+        })
+    return result
+
+
+def rebase_close_matrix(close_matrix, base_point=RELATIVE_BASE_POINT):
+    """
+    每列以第一个有收盘价的日期为基准, 转换为相对值 close / (基准收盘价 / base_point) - base_point, 空值保持 NaN
+    :return: np.ndarray, 全部为空的列也为 NaN
+    """
+    valid_matrix = ~np.isnan(close_matrix)
+    first_index_array = np.argmax(valid_matrix, axis=0)
+    base_array = close_matrix[first_index_array, np.arange(close_matrix.shape[1])] if len(close_matrix) else np.full(close_matrix.shape[1], np.nan)
+    return close_matrix / (base_array / base_point) - base_point
+
+
+def forward_fill_matrix(value_matrix, initial_value=0.0):
+    """按列向下填充空值, 每列第一个有值的位置之前填充 initial_value"""
+    row_index_matrix = np.where(~np.isnan(value_matrix), np.arange(len(value_matrix))[:, None], -1)
+    np.maximum.accumulate(row_index_matrix, axis=0, out=row_index_matrix)
+    filled_matrix = value_matrix[np.maximum(row_index_matrix, 0), np.arange(value_matrix.shape[1])]
+    return np.where(row_index_matrix >= 0, filled_matrix, initial_value)
+
+
+def get_spread_matrix(close_matrix, benchmark_index):
+    """每列收盘价与第 benchmark_index 列收盘价之差, 任一方为空的位置为 NaN"""
+    return close_matrix - close_matrix[:, [benchmark_index]]
@@ -0,0 +1,56 @@
+import contextlib
+import importlib.util
+import os
+import sys
+import tempfile
+import types
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+# source/config.py 随部署环境提供, 不在仓库中, 测试时使用临时配置
+if importlib.util.find_spec("source.config") is None:
+    config = types.ModuleType("source.config")
+    config.HOST, config.PORT, config.USER, config.PASSWORD, config.DB_NAME = "localhost", 5432, "test", "test", "test"
+    config.MINSIZE, config.MAXSIZE = 1, 10
+    config.SECRET_KEY, config.ALGORITHM, config.ACCESS_TOKEN_EXPIRE_MINUTES, config.USERS_DB = "test", "HS256", 30, {}
+    config.LOG_LOCATION, config.NOTE_DIR = tempfile.mkdtemp(), tempfile.mkdtemp()
+    config.STATIC_DIR = os.path.join(ROOT_DIR, "front")
+    sys.modules["source.config"] = config
+
+
+class FakeDbPool:
+    """只记录获取连接的次数, 查询由测试替换的函数完成"""
+
+    def __init__(self):
+        self.acquire_count = 0
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        self.acquire_count += 1
+        yield None
+
+    def get_max_size(self):
+        return 10
+
+
+@pytest.fixture
+def db_pool():
+    return FakeDbPool()
+
+
+@pytest.fixture
+def client(db_pool):
+    from fastapi.testclient import TestClient
+
+    import main
+    from source.util.util_cache.response_cache import data_version, response_cache
+
+    # 数据版本为空时不使用响应缓存
+    data_version.version = None
+    response_cache.clear()
+    main.app.state.db_pool = db_pool
+    return TestClient(main.app, raise_server_exceptions=False)
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from source.util.util_base import db
+
+
+class FakeConnection:
+    """按 backend pid 区分连接, 第一次执行某个 sql 时失败的情况由 fail_sql_set 指定"""
+
+    def __init__(self, pid, fail_sql_set=()):
+        self.pid = pid
+        self.fail_sql_set = set(fail_sql_set)
+
+    def get_server_pid(self):
+        return self.pid
+
+    async def fetch(self, sql, *args):
+        if sql in self.fail_sql_set:
+            self.fail_sql_set.discard(sql)
+            raise ValueError("relation does not exist")
+        return [(1,)]
+
+
+@pytest.fixture
+def statement_sql(monkeypatch):
+    monkeypatch.setattr(db, "_statement_registry", {})
+    monkeypatch.setattr(db, "_statement_stats", {})
+    monkeypatch.setattr(db, "_connection_statement_dict", {})
+    return db.register_statement("test.get_one", "select 1 where $1 = $1")
+
+
+def test_statement_stats_count_first_use_per_connection_as_miss(statement_sql):
+    conn_a, conn_b = FakeConnection(1), FakeConnection(2)
+
+    async def run():
+        for db_conn in (conn_a, conn_a, conn_b, conn_a):
+            await db.get_multi_data(db_conn, statement_sql, [1])
+
+    asyncio.run(run())
+    stats = db.get_statement_stats()["test.get_one"]
+    assert (stats["miss_count"], stats["hit_count"]) == (2, 2)
+
+
+def test_statement_stats_failed_first_use_is_not_cached(statement_sql):
+    db_conn = FakeConnection(1, fail_sql_set=[statement_sql])
+
+    async def run():
+        with pytest.raises(ValueError):
+            await db.get_multi_data(db_conn, statement_sql, [1])
+        await db.get_multi_data(db_conn, statement_sql, [1])
+        await db.get_multi_data(db_conn, statement_sql, [1])
+
+    asyncio.run(run())
+    stats = db.get_statement_stats()["test.get_one"]
+    assert (stats["miss_count"], stats["hit_count"]) == (2, 1)
@@ -0,0 +1,10 @@
+def test_front_static_file_revalidates_with_etag(client):
+    response = client.get("/front/favicon.ico")
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "no-cache"
+    etag = response.headers["etag"]
+
+    response = client.get("/front/favicon.ico", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
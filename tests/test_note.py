@@ -0,0 +1,52 @@
+import importlib
+
+note_data_module = importlib.import_module("source.util.util_data.note_data")
+
+NOTE_ROW = {"main_ts_code": "A.DCE", "ts_code": "A2105.DCE", "freq_code": "D", "trade_date": "2021-04-02", "note": "test"}
+BS_NOTE_ROW = dict(NOTE_ROW, trade_type="long_open", number=1, point=4500.0)
+
+
+def _fake_copy_records(record_dict):
+    async def fake_copy_records(db_conn, table_name, column_list, record_list):
+        record_dict[table_name] = record_list
+
+    return fake_copy_records
+
+
+def test_note_write_batch(client, monkeypatch):
+    record_dict = {}
+    monkeypatch.setattr(note_data_module, "copy_records", _fake_copy_records(record_dict))
+    response = client.post("/note/note_write_batch", json=[NOTE_ROW, dict(NOTE_ROW, note="test2")])
+
+    assert response.status_code == 200
+    assert response.json() == {"insert_number": 2, "error_list": []}
+    assert [i[4] for i in record_dict["future_note_data"]] == ["test", "test2"]
+
+
+def test_note_write_batch_with_invalid_row_writes_nothing(client, monkeypatch):
+    record_dict = {}
+    monkeypatch.setattr(note_data_module, "copy_records", _fake_copy_records(record_dict))
+    response = client.post("/note/note_write_batch", json=[NOTE_ROW, dict(NOTE_ROW, trade_date="2021-13-01"), dict(NOTE_ROW, freq_code="X")])
+
+    assert response.status_code == 200
+    assert response.json()["insert_number"] == 0
+    error_list = response.json()["error_list"]
+    assert [i["index"] for i in error_list] == [1, 2]
+    assert [i["error"][0]["loc"] for i in error_list] == [["trade_date"], ["freq_code"]]
+    assert all("url" not in j and "ctx" not in j for i in error_list for j in i["error"])
+    assert record_dict == {}
+
+
+def test_bs_note_write_batch_with_missing_field_writes_nothing(client, monkeypatch):
+    record_dict = {}
+    monkeypatch.setattr(note_data_module, "copy_records", _fake_copy_records(record_dict))
+    bs_note_row = dict(BS_NOTE_ROW)
+    del bs_note_row["point"]
+    response = client.post("/note/bs_note_write_batch", json=[BS_NOTE_ROW, bs_note_row])
+
+    assert response.status_code == 200
+    assert response.json()["insert_number"] == 0
+    assert response.json()["error_list"] == [
+        {"index": 1, "error": [{"type": "missing", "loc": ["point"], "msg": "Field required", "input": bs_note_row}]}
+    ]
+    assert record_dict == {}
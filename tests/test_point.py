@@ -0,0 +1,196 @@
+import datetime
+import importlib
+
+import pytest
+from pydantic import TypeAdapter
+
+point_router_module = importlib.import_module("source.point.point")
+
+POINT_REQUEST = {"start_date": "2021-04-01", "end_date": "2021-04-09", "ts_code": "A.DCE", "freq_code": "W"}
+HOLDING_REQUEST = {"start_date": "2021-04-01", "end_date": "2021-04-02", "ts_code": "A2105.DCE"}
+
+
+def _point_data_raw():
+    return {
+        datetime.date(2021, 4, 9): {"ts_code": "A2105.DCE", "open": 4520, "high": 4580.0, "low": 4500.0, "close": 4560.5, "vol": 2345.0},
+        datetime.date(2021, 4, 2): {"ts_code": "A2105.DCE", "open": 4500.0, "high": 4530.0, "low": 4480, "close": 4510.0, "vol": 1234},
+    }
+
+
+def _pure_holding_data_raw():
+    return {
+        datetime.date(2021, 4, 2): {
+            "long": [{"broker": "海通期货", "amount": 100, "chg": 10}, {"broker": "一德期货", "amount": 300, "chg": -5}],
+            "short": [{"broker": "鲁证期货", "amount": 200, "chg": 1}],
+            "vol": [{"broker": "东吴期货", "amount": 50, "chg": -2}],
+        }
+    }
+
+
+@pytest.mark.parametrize("path, func_name", [
+    ("/point/main_code_interval_point_data", "get_main_code_interval_point_data_by_freq_code"),
+    ("/point/ts_code_interval_point_data", "get_ts_code_interval_point_data_by_freq_code"),
+])
+def test_interval_point_data_follows_response_model(client, monkeypatch, path, func_name):
+    async def fake_get_point_data(db_conn, ts_code, start_date, end_date, freq_code):
+        return _point_data_raw()
+
+    monkeypatch.setattr(point_router_module, func_name, fake_get_point_data)
+    response = client.post(path, json=POINT_REQUEST)
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"date": "2021-04-02", "ts_code": "A2105.DCE", "open": 4500.0, "high": 4530.0, "low": 4480.0, "close": 4510.0, "vol": 1234},
+        {"date": "2021-04-09", "ts_code": "A2105.DCE", "open": 4520.0, "high": 4580.0, "low": 4500.0, "close": 4560.5, "vol": 2345},
+    ]
+    # response_model 中 open 为 float, vol 为 int
+    assert all(isinstance(row["open"], float) and isinstance(row["vol"], int) for row in response.json())
+
+
+def test_bulk_interval_point_data_follows_response_model(client, monkeypatch):
+    async def fake_get_bulk_point_data(db_conn, ts_code_list, start_date, end_date, freq_code):
+        return {"A.DCE": _point_data_raw()}
+
+    monkeypatch.setattr(point_router_module, "get_main_code_bulk_interval_point_data_by_freq_code", fake_get_bulk_point_data)
+    request = {"start_date": "2021-04-01", "end_date": "2021-04-09", "ts_code_list": ["A.DCE", "B.DCE"], "freq_code": "W"}
+    response = client.post("/point/main_code_bulk_interval_point_data", json=request)
+
+    assert response.status_code == 200
+    assert [i["ts_code"] for i in response.json()] == ["A.DCE", "B.DCE"]
+    assert response.json()[0]["data"][0] == {"date": "2021-04-02", "ts_code": "A2105.DCE", "open": 4500.0, "high": 4530.0, "low": 4480.0,
+                                             "close": 4510.0, "vol": 1234}
+    assert response.json()[1]["data"] == []
+
+
+def test_pure_holding_data(client, monkeypatch):
+    async def fake_get_pure_holding_data(db_conn, ts_code, start_date, end_date):
+        return _pure_holding_data_raw()
+
+    monkeypatch.setattr(point_router_module, "get_ts_code_interval_pure_holding_data", fake_get_pure_holding_data)
+    response = client.post("/point/ts_code_interval_pure_holding_data", json=HOLDING_REQUEST)
+
+    assert response.status_code == 200
+    assert response.json() == [{
+        "date": "2021-04-02",
+        "long": [{"broker": "一德期货", "amount": 300, "chg": -5, "percent": 0.75}, {"broker": "海通期货", "amount": 100, "chg": 10, "percent": 0.25}],
+        "short": [{"broker": "鲁证期货", "amount": 200, "chg": 1, "percent": 1.0}],
+        "vol": [{"broker": "东吴期货", "amount": 50, "chg": -2, "percent": 1.0}],
+    }]
+
+
+def test_pure_holding_data_first_n(client, monkeypatch):
+    async def fake_get_pure_holding_data(db_conn, ts_code, start_date, end_date):
+        return _pure_holding_data_raw()
+
+    point_module = importlib.import_module("source.util.util_module.point_module")
+    monkeypatch.setattr(point_module, "get_ts_code_interval_pure_holding_data", fake_get_pure_holding_data)
+    response = client.post("/point/ts_code_interval_pure_holding_data_first_n", json=HOLDING_REQUEST)
+
+    assert response.status_code == 200
+    assert response.json() == [
+        {"first_n": 1, "data": [{"date": "2021-04-02", "long": 300, "long_percent": 0.75, "short": 200, "short_percent": 1.0}]},
+        {"first_n": 3, "data": [{"date": "2021-04-02", "long": 400, "long_percent": 1.0, "short": 200, "short_percent": 1.0}]},
+        {"first_n": 20, "data": [{"date": "2021-04-02", "long": 400, "long_percent": 1.0, "short": 200, "short_percent": 1.0}]},
+    ]
+
+
+def test_pure_volume_data(client, monkeypatch):
+    async def fake_get_pure_holding_data(db_conn, ts_code, start_date, end_date):
+        return _pure_holding_data_raw()
+
+    monkeypatch.setattr(point_router_module, "get_ts_code_interval_pure_holding_data", fake_get_pure_holding_data)
+    response = client.post("/point/ts_code_interval_pure_volume_data", json=HOLDING_REQUEST)
+
+    assert response.status_code == 200
+    assert response.json() == {
+        "long": [{"amount": 100, "percent": 0.25, "broker": "海通期货", "date": "2021-04-02"},
+                 {"amount": 300, "percent": 0.75, "broker": "一德期货", "date": "2021-04-02"}],
+        "short": [{"amount": 200, "percent": 1.0, "broker": "鲁证期货", "date": "2021-04-02"}],
+        "vol": [{"amount": 50, "percent": 1.0, "broker": "东吴期货", "date": "2021-04-02"}],
+    }
+
+
+def test_pure_volume_data_without_data_fails(client, monkeypatch):
+    async def fake_get_pure_holding_data(db_conn, ts_code, start_date, end_date):
+        return {}
+
+    monkeypatch.setattr(point_router_module, "get_ts_code_interval_pure_holding_data", fake_get_pure_holding_data)
+    response = client.post("/point/ts_code_interval_pure_volume_data", json=HOLDING_REQUEST)
+
+    assert response.status_code == 500
+
+
+def _get_validated_body(path, body):
+    """按路由的 response_model 校验后重新序列化, 与 FastAPI 校验返回数据时的结果相同"""
+    route = next(i for i in point_router_module.point.routes if i.path == path)
+    type_adapter = TypeAdapter(route.response_model)
+    return type_adapter.dump_json(type_adapter.validate_json(body))
+
+
+@pytest.mark.parametrize("path, module, func_name, fake_result, request_params", [
+    ("/point/main_code_interval_point_data", point_router_module, "get_main_code_interval_point_data_by_freq_code", _point_data_raw, POINT_REQUEST),
+    ("/point/ts_code_interval_point_data", point_router_module, "get_ts_code_interval_point_data_by_freq_code", _point_data_raw, POINT_REQUEST),
+    ("/point/main_code_bulk_interval_point_data", point_router_module, "get_main_code_bulk_interval_point_data_by_freq_code",
+     lambda: {"A.DCE": _point_data_raw()}, {"start_date": "2021-04-01", "end_date": "2021-04-09", "ts_code_list": ["A.DCE", "B.DCE"], "freq_code": "W"}),
+    ("/point/ts_code_interval_pure_holding_data", point_router_module, "get_ts_code_interval_pure_holding_data", _pure_holding_data_raw, HOLDING_REQUEST),
+    ("/point/ts_code_interval_pure_holding_data_first_n", "source.util.util_module.point_module", "get_ts_code_interval_pure_holding_data", _pure_holding_data_raw,
+     HOLDING_REQUEST),
+    ("/point/ts_code_interval_pure_volume_data", point_router_module, "get_ts_code_interval_pure_holding_data", _pure_holding_data_raw, HOLDING_REQUEST),
+])
+def test_fast_json_response_matches_validated_body(client, monkeypatch, path, module, func_name, fake_result, request_params):
+    """跳过 response_model 校验直接序列化的响应体, 与经过校验的结果逐字节相同"""
+    async def fake_func(*args):
+        return fake_result()
+
+    if isinstance(module, str):
+        module = importlib.import_module(module)
+    monkeypatch.setattr(module, func_name, fake_func)
+    response = client.post(path, json=request_params)
+
+    assert response.status_code == 200
+    assert response.content == _get_validated_body(path, response.content)
+
+
+def test_interval_point_data_get_supports_conditional_request(client, monkeypatch):
+    from source.util.util_cache.response_cache import data_version
+
+    call_list = []
+
+    async def fake_get_point_data(db_conn, ts_code, start_date, end_date, freq_code):
+        call_list.append(ts_code)
+        return _point_data_raw()
+
+    monkeypatch.setattr(point_router_module, "get_main_code_interval_point_data_by_freq_code", fake_get_point_data)
+    monkeypatch.setattr(data_version, "version", ((datetime.date(2021, 4, 9), 1),))
+    monkeypatch.setattr(data_version, "settled_date", datetime.date(2021, 4, 9))
+
+    response = client.get("/point/main_code_interval_point_data", params=POINT_REQUEST)
+    assert response.status_code == 200
+    assert response.json() == client.post("/point/main_code_interval_point_data", json=POINT_REQUEST).json()
+    etag = response.headers["etag"]
+
+    response = client.get("/point/main_code_interval_point_data", params=POINT_REQUEST, headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["etag"] == etag
+    assert call_list == ["A.DCE", "A.DCE"]
+
+    # 区间包含最新交易日所在的周, 数据版本变化后 ETag 随之变化
+    data_version.version = ((datetime.date(2021, 4, 12), 1),)
+    response = client.get("/point/main_code_interval_point_data", params=POINT_REQUEST, headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert call_list == ["A.DCE", "A.DCE", "A.DCE"]
+
+
+def test_interval_point_data_post_has_no_etag(client, monkeypatch):
+    from source.util.util_cache.response_cache import data_version
+
+    async def fake_get_point_data(db_conn, ts_code, start_date, end_date, freq_code):
+        return _point_data_raw()
+
+    monkeypatch.setattr(point_router_module, "get_main_code_interval_point_data_by_freq_code", fake_get_point_data)
+    monkeypatch.setattr(data_version, "version", ((datetime.date(2021, 4, 9), 1),))
+    response = client.post("/point/main_code_interval_point_data", json=POINT_REQUEST)
+
+    assert response.status_code == 200
+    assert "etag" not in response.headers
@@ -0,0 +1,82 @@
+import asyncio
+import datetime
+
+import numpy as np
+import pytest
+
+from source.util.util_base.constant import FreqCode, PointDataType
+from source.util.util_module import point_module
+from source.util.util_module.point_module import FREQ_POINT_STORE_START_DATE
+
+DAILY_START_DATE = datetime.date(1999, 6, 1)
+DAILY_END_DATE = datetime.date(2001, 3, 31)
+
+
+def _daily_columnar_data():
+    rng = np.random.default_rng(0)
+    date_list = [DAILY_START_DATE + datetime.timedelta(days=i) for i in range((DAILY_END_DATE - DAILY_START_DATE).days + 1)]
+    trade_date_array = np.array([i for i in date_list if i.weekday() < 5], dtype="datetime64[D]")
+    close_array = 3000 + rng.normal(0, 20, len(trade_date_array)).cumsum()
+    open_array = close_array + rng.normal(0, 5, len(trade_date_array))
+    return {
+        "ts_code": np.array(["A.DCE"] * len(trade_date_array), dtype=object),
+        "trade_date": trade_date_array,
+        "open": open_array,
+        "high": np.maximum(open_array, close_array) + 3,
+        "low": np.minimum(open_array, close_array) - 3,
+        "close": close_array,
+        "vol": rng.integers(1000, 5000, len(trade_date_array)).astype(float)
+    }
+
+
+@pytest.fixture
+def freq_point_store(monkeypatch):
+    """日线为随机数据, 存储为 FREQ_POINT_STORE_START_DATE 至 2000-12-31 的聚合结果, 记录读取存储的区间"""
+    daily_data = _daily_columnar_data()
+    read_interval_list = []
+
+    async def fake_get_daily_columnar_data(db_conn, ts_code, data_type, start_date, end_date):
+        flag = (daily_data["trade_date"] >= np.datetime64(start_date)) & (daily_data["trade_date"] <= np.datetime64(end_date))
+        return {column_name: column_value[flag] for column_name, column_value in daily_data.items()}
+
+    monkeypatch.setattr(point_module, "_get_daily_columnar_data", fake_get_daily_columnar_data)
+
+    def build_store(freq_code):
+        store_end_date = point_module.get_end_date_by_freq_code(datetime.date(2000, 12, 31), freq_code)
+        store = asyncio.run(point_module._get_interval_point_data_from_daily(
+            None, "A.DCE", PointDataType.MAIN, FREQ_POINT_STORE_START_DATE, store_end_date, freq_code
+        ))
+        last_period = [point_module.get_interval_date_list_by_freq_code(FREQ_POINT_STORE_START_DATE, store_end_date, freq_code)[-1][0], max(store)]
+
+        async def fake_get_last_stored_period(db_conn, ts_code, data_type, freq_code):
+            return last_period
+
+        async def fake_get_freq_point_data(self, ts_code, data_type, freq_code, start_date, end_date):
+            read_interval_list.append((start_date, end_date))
+            return {trade_date: date_data for trade_date, date_data in store.items() if start_date <= trade_date <= end_date}
+
+        monkeypatch.setattr(point_module, "_get_last_stored_period", fake_get_last_stored_period)
+        monkeypatch.setattr(point_module.FreqPointData, "get_freq_point_data", fake_get_freq_point_data)
+
+    return build_store, read_interval_list
+
+
+@pytest.mark.parametrize("freq_code", [FreqCode.WEEK, FreqCode.MONTH])
+@pytest.mark.parametrize("start_date, end_date", [
+    # 开始日期早于存储起始日期, 1999-07-14 不是周期开始日期, 1999-11-01 为周一且为月初
+    (datetime.date(1999, 7, 14), datetime.date(2001, 2, 20)),
+    (datetime.date(1999, 11, 1), datetime.date(2000, 6, 30)),
+    # 结束日期早于存储起始日期
+    (datetime.date(1999, 7, 14), datetime.date(1999, 12, 15)),
+    # 结束日期晚于存储中最后一个周期
+    (datetime.date(2000, 3, 8), datetime.date(2001, 3, 10)),
+])
+def test_interval_point_data_from_store_matches_daily(freq_point_store, freq_code, start_date, end_date):
+    build_store, read_interval_list = freq_point_store
+    build_store(freq_code)
+
+    result = asyncio.run(point_module._get_interval_point_data_from_store(None, "A.DCE", PointDataType.MAIN, start_date, end_date, freq_code))
+    expected = asyncio.run(point_module._get_interval_point_data_from_daily(None, "A.DCE", PointDataType.MAIN, start_date, end_date, freq_code))
+
+    assert result == expected
+    assert all(read_start_date >= FREQ_POINT_STORE_START_DATE for read_start_date, _ in read_interval_list)
@@ -0,0 +1,33 @@
+import math
+
+import numpy as np
+import pytest
+
+from source.util.util_base.range_extrema_util import build_sparse_table, query_sparse_table
+
+
+def _reduce_by_loop(value_array, reduce_func, start_index, end_index):
+    value_list = [i for i in value_array[start_index: end_index + 1].tolist() if not math.isnan(i)]
+    return reduce_func(value_list) if value_list else None
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("length", [1, 2, 7, 64, 100])
+@pytest.mark.parametrize("reduce_func, loop_reduce_func", [(np.fmax, max), (np.fmin, min)])
+def test_query_sparse_table_matches_loop(seed, length, reduce_func, loop_reduce_func):
+    rng = np.random.default_rng(seed)
+    value_array = rng.normal(3000, 50, length)
+    value_array[rng.random(length) < 0.2] = np.nan
+    start_index_array = rng.integers(0, length, 200)
+    end_index_array = start_index_array + (rng.random(200) * (length - start_index_array)).astype(np.int64)
+
+    sparse_table = build_sparse_table(value_array, reduce_func)
+    result = query_sparse_table(sparse_table, reduce_func, start_index_array, end_index_array)
+
+    expected = [_reduce_by_loop(value_array, loop_reduce_func, i, j) for i, j in zip(start_index_array.tolist(), end_index_array.tolist())]
+    assert [None if math.isnan(i) else i for i in result.tolist()] == expected
+
+
+def test_query_sparse_table_without_interval():
+    sparse_table = build_sparse_table(np.array([1.0, 2.0]), np.fmax)
+    assert len(query_sparse_table(sparse_table, np.fmax, [], [])) == 0
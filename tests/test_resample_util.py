@@ -0,0 +1,86 @@
+import datetime
+import math
+
+import numpy as np
+import pytest
+
+from source.util.util_base.constant import FreqCode
+from source.util.util_base.date_util import get_interval_date_list_by_freq_code
+from source.util.util_base.resample_util import resample_ohlcv
+
+
+def _random_daily_data(seed, start_date, end_date):
+    """随机的日线数据, 包含空值及开盘价为 0 的交易日"""
+    rng = np.random.default_rng(seed)
+    date_list = [start_date + datetime.timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+    date_list = [i for i in date_list if i.weekday() < 5 and rng.random() > 0.1]
+    date_number = len(date_list)
+
+    close_array = 3000 + rng.normal(0, 20, date_number).cumsum()
+    open_array = close_array + rng.normal(0, 5, date_number)
+    high_array = np.maximum(open_array, close_array) + rng.random(date_number) * 10
+    low_array = np.minimum(open_array, close_array) - rng.random(date_number) * 10
+    vol_array = rng.integers(1000, 5000, date_number).astype(float)
+    for value_array in (open_array, high_array, low_array, close_array, vol_array):
+        value_array[rng.random(date_number) < 0.05] = np.nan
+    open_array[rng.random(date_number) < 0.03] = 0
+    return {
+        "date": np.array(date_list, dtype="datetime64[D]"),
+        "open": open_array,
+        "high": high_array,
+        "low": low_array,
+        "close": close_array,
+        "vol": vol_array
+    }
+
+
+def _resample_by_period_loop(daily_data, interval_date_list):
+    """逐周期遍历的聚合, 与向量化之前的实现相同"""
+    date_list = daily_data["date"].tolist()
+    result = []
+    for start_date, end_date in interval_date_list:
+        index_list = [i for i, date in enumerate(date_list) if start_date <= date <= end_date]
+        if not index_list:
+            continue
+        open_price, close = daily_data["open"][index_list[0]], daily_data["close"][index_list[-1]]
+        if math.isnan(open_price) or not open_price or math.isnan(close) or not close:
+            continue
+        high_list = [daily_data["high"][i] for i in index_list if not math.isnan(daily_data["high"][i])]
+        low_list = [daily_data["low"][i] for i in index_list if not math.isnan(daily_data["low"][i])]
+        result.append([
+            date_list[index_list[-1]], open_price, max(high_list) if high_list else None, min(low_list) if low_list else None, close,
+            daily_data["vol"][index_list[-1]]
+        ])
+    return result
+
+
+def _to_row_list(resample_data):
+    row_list = []
+    for row in zip(resample_data["date"].tolist(), *[resample_data[i].tolist() for i in ("open", "high", "low", "close", "vol")]):
+        row_list.append([None if isinstance(i, float) and math.isnan(i) else i for i in row])
+    return row_list
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("freq_code", [FreqCode.DAY, FreqCode.WEEK, FreqCode.MONTH])
+def test_resample_ohlcv_matches_period_loop(seed, freq_code):
+    daily_data = _random_daily_data(seed, datetime.date(2020, 1, 15), datetime.date(2020, 12, 31))
+    # 最后一个周期之后的数据不属于任何周期
+    interval_date_list = get_interval_date_list_by_freq_code(datetime.date(2020, 1, 15), datetime.date(2020, 11, 20), freq_code)
+
+    resample_data = resample_ohlcv(
+        daily_data["date"], daily_data["open"], daily_data["high"], daily_data["low"], daily_data["close"], daily_data["vol"],
+        np.array([i[-1] for i in interval_date_list], dtype="datetime64[D]")
+    )
+
+    expected = _resample_by_period_loop(daily_data, interval_date_list)
+    expected = [[None if isinstance(i, float) and math.isnan(i) else i for i in row] for row in expected]
+    assert _to_row_list(resample_data) == expected
+
+
+def test_resample_ohlcv_without_data():
+    empty_date_array = np.array([], dtype="datetime64[D]")
+    resample_data = resample_ohlcv(
+        empty_date_array, np.array([]), np.array([]), np.array([]), np.array([]), np.array([]), np.array(["2021-04-09"], dtype="datetime64[D]")
+    )
+    assert all(len(value_array) == 0 for value_array in resample_data.values())
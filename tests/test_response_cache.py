@@ -0,0 +1,90 @@
+import datetime
+
+import pytest
+from fastapi import APIRouter, Depends, FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+from source.util.util_base.constant import FreqCode
+from source.util.util_cache.response_cache import CacheRoute, DataVersion, cache_response, data_version, response_cache
+
+# 2021-04-08 为周四
+SETTLED_DATE = datetime.date(2021, 4, 8)
+
+
+@pytest.fixture
+def settled_data_version():
+    version = DataVersion()
+    version.settled_date = SETTLED_DATE
+    return version
+
+
+@pytest.mark.parametrize("end_date, freq_code, settled_flag", [
+    (datetime.date(2021, 4, 7), None, True),
+    (datetime.date(2021, 4, 7), FreqCode.DAY, True),
+    (datetime.date(2021, 4, 8), FreqCode.DAY, False),
+    # 周线的最后一根 K 线到 2021-04-09(周五), 还会变化
+    (datetime.date(2021, 4, 5), FreqCode.WEEK, False),
+    (datetime.date(2021, 4, 2), FreqCode.WEEK, True),
+    # 月线的最后一根 K 线到 2021-04-30
+    (datetime.date(2021, 4, 1), FreqCode.MONTH, False),
+    (datetime.date(2021, 3, 31), FreqCode.MONTH, True),
+    (None, FreqCode.DAY, False),
+])
+def test_is_settled(settled_data_version, end_date, freq_code, settled_flag):
+    assert settled_data_version.is_settled(end_date, freq_code) is settled_flag
+
+
+def test_is_settled_without_data_version():
+    assert DataVersion().is_settled(datetime.date(2000, 1, 1)) is False
+
+
+@pytest.fixture
+def cache_app(monkeypatch):
+    def check_token(request: Request):
+        if request.headers.get("Authorization") != "Bearer test":
+            raise HTTPException(status_code=401, detail="Not authenticated")
+
+    router = APIRouter(prefix="/cache", route_class=CacheRoute)
+    call_list = []
+
+    @router.post("/data")
+    @cache_response
+    async def get_data(request: Request, request_params: dict):
+        call_list.append(request_params)
+        return {"end_date": request_params["end_date"]}
+
+    app = FastAPI()
+    app.include_router(router, dependencies=[Depends(check_token)])
+    monkeypatch.setattr(data_version, "version", ((SETTLED_DATE, 1),))
+    monkeypatch.setattr(data_version, "settled_date", SETTLED_DATE)
+    response_cache.clear()
+    yield TestClient(app), call_list
+    response_cache.clear()
+
+
+def test_cache_hit_runs_router_dependencies(cache_app):
+    client, call_list = cache_app
+    request_params = {"end_date": "2021-04-01"}
+
+    assert client.post("/cache/data", json=request_params).status_code == 401
+    response = client.post("/cache/data", json=request_params, headers={"Authorization": "Bearer test"})
+    assert response.status_code == 200
+
+    # 已缓存, 未登录时仍返回 401
+    assert client.post("/cache/data", json=request_params).status_code == 401
+    response = client.post("/cache/data", json=request_params, headers={"Authorization": "Bearer test"})
+    assert response.status_code == 200
+    assert response.json() == {"end_date": "2021-04-01"}
+    assert call_list == [request_params]
+
+
+def test_weekly_request_in_open_period_follows_data_version(cache_app):
+    client, call_list = cache_app
+    headers = {"Authorization": "Bearer test"}
+    request_params = {"end_date": "2021-04-05", "freq_code": "W"}
+
+    client.post("/cache/data", json=request_params, headers=headers)
+    data_version.version = ((datetime.date(2021, 4, 9), 1),)
+    client.post("/cache/data", json=request_params, headers=headers)
+
+    assert call_list == [request_params, request_params]
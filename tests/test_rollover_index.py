@@ -0,0 +1,83 @@
+import asyncio
+import datetime
+import random
+
+import pytest
+
+from source.util.util_cache import rollover_index as rollover_index_module
+from source.util.util_cache.rollover_index import RolloverIndex
+
+START_DATE = datetime.date(2021, 1, 1)
+
+
+def _random_main_code_data(seed):
+    """[[main_ts_code, trade_date, mapping_ts_code], ...], 交易日有缺失, 同一合约可能隔段再次成为主力"""
+    rng = random.Random(seed)
+    main_code_data = []
+    for main_ts_code in ("A.DCE", "AL.SHF"):
+        ts_code_list = ["{0}21{1:02d}.{2}".format(main_ts_code.split(".")[0], i, main_ts_code.split(".")[1]) for i in range(1, 6)]
+        ts_code = ts_code_list[0]
+        for day in range(120):
+            if rng.random() < 0.2:
+                continue
+            if rng.random() < 0.1:
+                ts_code = rng.choice(ts_code_list)
+            main_code_data.append([main_ts_code, START_DATE + datetime.timedelta(days=day), ts_code])
+    # 主力连续代码的别名, 映射到同样的合约
+    main_code_data.extend([["A2.DCE", trade_date, ts_code] for main_ts_code, trade_date, ts_code in main_code_data if main_ts_code == "A.DCE"])
+    main_code_data.sort()
+    return main_code_data
+
+
+def _load_rollover_index(monkeypatch, main_code_data, split_date):
+    """先加载 split_date 之前的数据, 再增量加载"""
+    index = RolloverIndex()
+
+    async def fake_get_multi_data(db_conn, sql, args=None):
+        if args is None:
+            return [row for row in main_code_data if row[1] < split_date]
+        return [row for row in main_code_data if row[1] >= args[0]]
+
+    monkeypatch.setattr(rollover_index_module, "get_multi_data", fake_get_multi_data)
+    asyncio.run(index._load(None))
+    asyncio.run(index._load(None))
+    return index
+
+
+def _get_expected_change_date_list(mapping_dict, start_date, end_date):
+    date_list = sorted(i for i in mapping_dict if start_date <= i <= end_date)
+    return [date_list[i] for i in range(1, len(date_list)) if mapping_dict[date_list[i]] != mapping_dict[date_list[i - 1]]]
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_rollover_index_matches_daily_mapping(monkeypatch, seed):
+    main_code_data = _random_main_code_data(seed)
+    index = _load_rollover_index(monkeypatch, main_code_data, START_DATE + datetime.timedelta(days=60))
+    mapping_dict = {}
+    for main_ts_code, trade_date, ts_code in main_code_data:
+        mapping_dict.setdefault(main_ts_code, {})[trade_date] = ts_code
+
+    rng = random.Random(seed)
+    for main_ts_code in ("A.DCE", "AL.SHF"):
+        for day in range(-5, 130):
+            data_date = START_DATE + datetime.timedelta(days=day)
+            assert index.get_ts_code_by_main_ts_code(main_ts_code, data_date) == mapping_dict[main_ts_code].get(data_date)
+
+        for _ in range(50):
+            start_date = START_DATE + datetime.timedelta(days=rng.randint(-5, 125))
+            end_date = start_date + datetime.timedelta(days=rng.randint(0, 60))
+            expected = sorted([i, j] for i, j in mapping_dict[main_ts_code].items() if start_date <= i <= end_date)
+            assert index.main_code_segment_dict[main_ts_code].get_interval_data(start_date, end_date) == expected
+            assert index.get_contract_change_date_list(main_ts_code, start_date, end_date) == \
+                _get_expected_change_date_list(mapping_dict[main_ts_code], start_date, end_date)
+
+
+def test_rollover_index_reverse_mapping(monkeypatch):
+    main_code_data = _random_main_code_data(0)
+    index = _load_rollover_index(monkeypatch, main_code_data, START_DATE + datetime.timedelta(days=60))
+
+    ts_code = main_code_data[0][2]
+    assert index.get_main_ts_code_list_by_ts_code(ts_code) == ["A.DCE", "A2.DCE"]
+    assert index.get_shortest_main_ts_code("A2.DCE") == "A2.DCE"
+    assert index.get_shortest_main_ts_code(ts_code) == "A.DCE"
+    assert index.get_ts_code_by_main_ts_code("A.DCE", datetime.datetime(2021, 1, 1, 15)) == index.get_ts_code_by_main_ts_code("A.DCE", START_DATE)